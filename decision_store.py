@@ -0,0 +1,54 @@
+import os
+import time
+import sqlite3
+from wordlist_cache import CACHE_DIR
+
+DEFAULT_STORE = os.path.join(CACHE_DIR, 'space_decisions.sqlite')
+
+class DecisionStore:
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS decisions ("
+            "w1 TEXT NOT NULL, w2 TEXT NOT NULL, decision TEXT NOT NULL, "
+            "count INTEGER NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL, "
+            "PRIMARY KEY (w1, w2)) WITHOUT ROWID")
+        self.conn.commit()
+
+    def load(self):
+        return {(w1, w2): decision for w1, w2, decision in self.conn.execute("SELECT w1, w2, decision FROM decisions")}
+
+    def record(self, decisions):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO decisions VALUES (?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (w1, w2) DO UPDATE SET decision = excluded.decision, "
+                "count = count + 1, last_seen = excluded.last_seen",
+                ((w1, w2, decision, now, now) for (w1, w2), decision in decisions.items()))
+
+    def rows(self, keys):
+        return {key: self.conn.execute(
+                    "SELECT decision, count, first_seen, last_seen FROM decisions WHERE w1 = ? AND w2 = ?", key).fetchone()
+                for key in keys}
+
+    def restore(self, rows):
+        with self.conn:
+            for (w1, w2), row in rows.items():
+                if row is None:
+                    self.conn.execute("DELETE FROM decisions WHERE w1 = ? AND w2 = ?", (w1, w2))
+                else:
+                    self.conn.execute("INSERT OR REPLACE INTO decisions VALUES (?, ?, ?, ?, ?, ?)", (w1, w2) + tuple(row))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
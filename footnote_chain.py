@@ -0,0 +1,78 @@
+from bisect import bisect_left
+
+MIN_CHAIN_LENGTH = 3
+OFF_START_PENALTY = 0.8
+
+def build_number_index(numbers):
+    index = {}
+    for position, number in enumerate(numbers):
+        index.setdefault(number, []).append(position)
+    return index
+
+def find_forward_chain(index, anchor_position, anchor_number):
+    result = []
+    next_expected = anchor_number + 1
+    search_start = anchor_position + 1
+    while True:
+        positions = index.get(next_expected)
+        if not positions:
+            break
+        k = bisect_left(positions, search_start)
+        if k == len(positions):
+            break
+        result.append(positions[k])
+        search_start = positions[k] + 1
+        next_expected += 1
+    return result
+
+def longest_chain(numbers, positions):
+    best_end = {}
+    previous = {}
+    best = None
+    for position in positions:
+        number = numbers[position]
+        before = best_end.get(number - 1)
+        length = before[0] + 1 if before else 1
+        previous[position] = before[1] if before else None
+        current = best_end.get(number)
+        if current is None or length > current[0]:
+            best_end[number] = (length, position)
+        if best is None or length > best[0]:
+            best = (length, position)
+    chain = []
+    position = best[1] if best else None
+    while position is not None:
+        chain.append(position)
+        position = previous[position]
+    chain.reverse()
+    return chain
+
+def chain_confidence(numbers, positions, chain, previous_end):
+    first_number = numbers[chain[0]]
+    last_number = numbers[chain[-1]]
+    in_span = sum(1 for p in positions
+                  if chain[0] <= p <= chain[-1] and first_number <= numbers[p] <= last_number)
+    confidence = len(chain) / in_span
+    if first_number != 1 and first_number != previous_end + 1:
+        confidence *= OFF_START_PENALTY
+    return confidence
+
+def detect_chains(numbers, chapters, min_length=MIN_CHAIN_LENGTH):
+    by_chapter = {}
+    for position, chapter in enumerate(chapters):
+        by_chapter.setdefault(chapter, []).append(position)
+    chains = []
+    previous_end = 0
+    for chapter in sorted(by_chapter):
+        positions = by_chapter[chapter]
+        chain = longest_chain(numbers, positions)
+        if len(chain) < min_length:
+            continue
+        chains.append({
+            "chapter": chapter,
+            "positions": chain,
+            "start": numbers[chain[0]],
+            "end": numbers[chain[-1]],
+            "confidence": chain_confidence(numbers, positions, chain, previous_end)})
+        previous_end = numbers[chain[-1]]
+    return chains
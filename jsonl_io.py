@@ -0,0 +1,120 @@
+import os
+import glob
+import json
+from pathlib import Path
+
+WRITE_BATCH = 1000
+JSONL_SUFFIXES = ('.json', '.jsonl')
+
+try:
+    import orjson
+    JSON_BACKEND = "orjson"
+    fast_loads = orjson.loads
+    FAST_DECODE_ERRORS = (orjson.JSONDecodeError,)
+except ImportError:
+    try:
+        import msgspec
+        JSON_BACKEND = "msgspec"
+        fast_loads = msgspec.json.decode
+        FAST_DECODE_ERRORS = (msgspec.DecodeError,)
+    except ImportError:
+        JSON_BACKEND = "json"
+        fast_loads = json.loads
+        FAST_DECODE_ERRORS = (ValueError,)
+
+class JsonlError(ValueError):
+    def __init__(self, line_num, error):
+        super().__init__(f"Invalid JSON at line {line_num}: {error}")
+        self.line_num = line_num
+        self.error = error
+
+def print_error(line_num, error):
+    print(f"JSON error on line {line_num}: {error}")
+
+def expand_inputs(patterns, suffixes=JSONL_SUFFIXES):
+    files = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            files.update(p for p in path.rglob('*') if p.is_file() and p.suffix in suffixes)
+        elif path.is_file():
+            files.add(path)
+        else:
+            files.update(Path(p) for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(files)
+
+def iter_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            yield line_num, line
+
+def iter_numbered_blocks(path, on_error=None):
+    for line_num, line in iter_lines(path):
+        try:
+            block = json.loads(line)
+        except json.JSONDecodeError as e:
+            if on_error is None:
+                raise JsonlError(line_num, e) from e
+            on_error(line_num, e)
+            continue
+        yield line_num, block
+
+def iter_blocks(path, on_error=None):
+    for _, block in iter_numbered_blocks(path, on_error):
+        yield block
+
+class BlockWriter:
+    def __init__(self, path, separators=None, batch_size=WRITE_BATCH):
+        self.path = path
+        self.separators = separators
+        self.batch_size = batch_size
+        self.count = 0
+        self._pending = []
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, block):
+        self.write_line(json.dumps(block, ensure_ascii=False, separators=self.separators))
+
+    def write_line(self, line):
+        self._pending.append(line)
+        self.count += 1
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._file.write("\n".join(self._pending))
+            self._file.write("\n")
+            self._pending = []
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def write_blocks(path, blocks, separators=None):
+    with BlockWriter(path, separators=separators) as writer:
+        for block in blocks:
+            writer.write(block)
+    return writer.count
+
+def rewrite_blocks(src_path, path, changed, separators=None):
+    with BlockWriter(path, separators=separators) as writer:
+        for block_idx, (_, line) in enumerate(iter_lines(src_path)):
+            if block_idx in changed:
+                writer.write(changed[block_idx])
+            else:
+                writer.write_line(line)
+    return writer.count
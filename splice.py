@@ -0,0 +1,14 @@
+def splice(text, edits):
+    parts = []
+    pos = 0
+    for start, end, replacement in edits:
+        if start < pos:
+            raise ValueError(f"overlapping or unsorted edit at {start}")
+        parts.append(text[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+def wrap_sup(text, spans):
+    return splice(text, ((start, end, f"<sup>{text[start:end]}</sup>") for start, end in spans))
@@ -0,0 +1,18 @@
+from word_segmentation import UnigramModel, segment_tokens
+
+WORDLIST = {"said", "it", "may", "be", "maybe", "right", "every", "one", "everyone",
+            "of", "them", "the", "reconstruction", "was", "slow"}
+
+def segment(text, corpus=()):
+    tokens = text.split()
+    model = UnigramModel.from_token_lists([tokens] + [line.split() for line in corpus], WORDLIST)
+    result, _ = segment_tokens(tokens, model)
+    return ' '.join(result)
+
+def test_known_pairs_are_left_for_review():
+    corpus = ["it may be right"] * 300 + ["maybe"] * 20
+    assert segment("Olsen said it may be right", corpus) == "Olsen said it may be right"
+    assert segment("every one of them xq") == "every one of them xq"
+
+def test_unknown_fragments_are_joined():
+    assert segment("the re con struc tion was slow") == "the reconstruction was slow"
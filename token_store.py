@@ -0,0 +1,24 @@
+from array import array
+
+MAX_DIGITS = 18
+
+class TokenStore:
+    def __init__(self, text_of, snippet_of):
+        self.text_of = text_of
+        self.snippet_of = snippet_of
+        self.block_idx = array('q')
+        self.start = array('q')
+        self.end = array('q')
+        self.number = array('q')
+
+    def append(self, block_idx, start, end, number):
+        self.block_idx.append(block_idx)
+        self.start.append(start)
+        self.end.append(end)
+        self.number.append(number)
+
+    def __len__(self):
+        return len(self.number)
+
+    def snippet(self, i):
+        return self.snippet_of(self.text_of(self.block_idx[i]), self.start[i], self.end[i])
@@ -1,19 +1,148 @@
-from collections import defaultdict
+import os
+import re
+import csv
+import sys
+import json
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from jsonl_io import expand_inputs
 
 approved_chars = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZæøåÆØÅ0123456789äöüÄÖÜß .,!?:;"\'()-_/@#%&*+=|\\ {}<>’‘“”—–[]áéíóúñàèìòùê$»«'
 approved_set = set(approved_chars)
+unwanted_pattern = re.compile('[^' + ''.join(sorted(re.escape(c) for c in approved_set)) + ']')
 context_before = 40
 context_after = 20
+max_examples = 3
+audit_suffixes = ('.json', '.jsonl', '.txt')
 
-if __name__ == '__main__':
+def scan_file(filename, examples_per_char=max_examples):
+    counts = Counter()
+    examples = {}
+    offset = 0
+    with open(filename, 'rb') as f:
+        for line_num, raw in enumerate(f, 1):
+            line = raw.decode('utf-8')
+            for m in unwanted_pattern.finditer(line):
+                c = m.group()
+                if not c.isprintable():
+                    continue
+                counts[c] += 1
+                samples = examples.setdefault(c, [])
+                if len(samples) < examples_per_char:
+                    samples.append((line_num, m.start(), offset))
+            offset += len(raw)
+    return counts, examples
+
+def read_line_at(filename, offset):
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        return f.readline().decode('utf-8')
+
+def format_snippet(line_text, col):
+    expanded = line_text.rstrip('\n\r').expandtabs(8)
+    pos = len(line_text[:col].expandtabs(8))
+    start = max(0, pos - context_before)
+    snippet = expanded[start:pos + context_after + 1]
+    if start > 0:
+        snippet = '...' + snippet
+    if pos + context_after < len(expanded):
+        snippet += '...'
+    return snippet
+
+def scan_shard(shard):
+    files, examples_per_char = shard
+    counts = Counter()
+    file_counts = Counter()
+    examples = {}
+    failed = []
+    for filename in files:
+        try:
+            file_char_counts, file_examples = scan_file(filename, examples_per_char)
+        except (OSError, UnicodeDecodeError) as e:
+            failed.append((filename, str(e)))
+            continue
+        counts.update(file_char_counts)
+        file_counts.update(file_char_counts.keys())
+        for c, samples in file_examples.items():
+            kept = examples.setdefault(c, [])
+            kept.extend((filename,) + sample for sample in samples[:examples_per_char - len(kept)])
+    return counts, file_counts, examples, failed
+
+def merge_shards(partials, examples_per_char=max_examples):
+    counts = Counter()
+    file_counts = Counter()
+    examples = {}
+    failed = []
+    for part_counts, part_file_counts, part_examples, part_failed in partials:
+        counts.update(part_counts)
+        file_counts.update(part_file_counts)
+        for c, samples in part_examples.items():
+            examples.setdefault(c, []).extend(samples)
+        failed.extend(part_failed)
+    for c in examples:
+        examples[c] = sorted(examples[c])[:examples_per_char]
+    return counts, file_counts, examples, sorted(failed)
+
+def audit_files(files, jobs=1, examples_per_char=max_examples):
+    files = [str(f) for f in files]
+    jobs = max(1, min(jobs, len(files)))
+    shards = [(files[i::jobs], examples_per_char) for i in range(jobs)]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            partials = list(pool.map(scan_shard, shards))
+    else:
+        partials = [scan_shard(shard) for shard in shards]
+    return merge_shards(partials, examples_per_char)
+
+def build_report_rows(counts, file_counts, examples):
+    rows = []
+    for c in sorted(counts, key=lambda c: (ord(c), c)):
+        samples = []
+        for filename, line_num, col, offset in examples.get(c, []):
+            samples.append({
+                'file': filename,
+                'line': line_num,
+                'column': col + 1,
+                'offset': offset,
+                'context': format_snippet(read_line_at(filename, offset), col)})
+        rows.append({
+            'character': c,
+            'codepoint': f'U+{ord(c):04X}',
+            'count': counts[c],
+            'files': file_counts[c],
+            'samples': samples})
+    return rows
+
+def write_report(path, rows):
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['character', 'codepoint', 'count', 'files', 'samples'])
+            for row in rows:
+                samples = '; '.join(f"{s['file']}:{s['line']}:{s['column']}" for s in row['samples'])
+                writer.writerow([row['character'], row['codepoint'], row['count'], row['files'], samples])
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+def run_batch(args):
+    files = expand_inputs(args.paths, audit_suffixes)
+    if not files:
+        print('No input files found')
+        exit(1)
+    counts, file_counts, examples, failed = audit_files(files, args.jobs, args.examples)
+    for filename, error in failed:
+        print(f'Could not scan {filename}: {error}')
+    rows = build_report_rows(counts, file_counts, examples)
+    write_report(args.report, rows)
+    print(f'Scanned {len(files) - len(failed)} of {len(files)} files, found {len(rows)} characters, report written to {args.report}')
+    exit(1 if rows or failed else 0)
+
+def run_interactive():
     filename = input('Input file: ').strip() or 'input.json'
     try:
-        char_locations = defaultdict(list)
-        with open(filename, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                for col, c in enumerate(line):
-                    if c not in approved_set and c.isprintable():
-                        char_locations[c].append((line_num, col, line))
+        char_counts, char_examples = scan_file(filename)
     except FileNotFoundError:
         print('File not found')
         exit(1)
@@ -23,25 +152,17 @@ if __name__ == '__main__':
     except Exception as e:
         print('Error reading file:', e)
         exit(1)
-    if not char_locations:
+    if not char_counts:
         print('No unwanted printable characters found in the file.')
         exit(0)
-    sorted_chars = sorted(char_locations.keys(), key=lambda c: (ord(c), c))
-    total_occurrences = sum(len(loc) for loc in char_locations.values())
+    sorted_chars = sorted(char_counts.keys(), key=lambda c: (ord(c), c))
+    total_occurrences = sum(char_counts.values())
     print(f'Found {len(sorted_chars)} characters') #({total_occurrences} occurrences).')
     print('Enter to see the next character, q to quit.')
     for char_idx, bad_char in enumerate(sorted_chars, 1):
-        line_num, col, line_text = char_locations[bad_char][0]
-        expanded = line_text.rstrip('\n\r').expandtabs(8)
-        pos = len(line_text[:col].expandtabs(8))
-        start = max(0, pos - context_before)
-        snippet = expanded[start:pos + context_after + 1]
-        display_snippet = snippet
-        if start > 0:
-            display_snippet = '...' + display_snippet
-        if pos + context_after < len(expanded):
-            display_snippet += '...'
-        appearances = len(char_locations[bad_char])
+        line_num, col, offset = char_examples[bad_char][0]
+        display_snippet = format_snippet(read_line_at(filename, offset), col)
+        appearances = char_counts[bad_char]
         print(f'{char_idx}/{len(sorted_chars)}: "{bad_char}" (U+{ord(bad_char):04X}) appears {appearances} time{"s" if appearances > 1 else ""}')
         print(f'Example at line {line_num}:') #, position {col + 1}')
         print(display_snippet)
@@ -52,3 +173,16 @@ if __name__ == '__main__':
     else:
         print('Finished showing one examples.')
 
+def main():
+    if len(sys.argv) == 1:
+        run_interactive()
+        return
+    parser = argparse.ArgumentParser(description='Audit files for characters outside the approved set.')
+    parser.add_argument('paths', nargs='+', help='files, directories or glob patterns')
+    parser.add_argument('-o', '--report', default='character_report.json', help='report file, .json or .csv')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('-n', '--examples', type=int, default=max_examples, help='sample locations per character')
+    run_batch(parser.parse_args())
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,35 @@
+import os
 import sys
 import json
+import mmap
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from jsonl_io import JSON_BACKEND, FAST_DECODE_ERRORS, fast_loads, expand_inputs
 
 INPUT_FILE = 'input.json'
+CHUNK_SIZE = 16 * 1024 * 1024
 
 def main():
-    filepath = INPUT_FILE
-    input_path = validate_file_exists(filepath)
-    if input_path is None:
+    parser = argparse.ArgumentParser(description="Check JSONL files for lines that do not parse.")
+    parser.add_argument("paths", nargs="*", help=f"files, directories or glob patterns (default: {INPUT_FILE})")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    args = parser.parse_args()
+    if args.paths:
+        files = expand_inputs(args.paths)
+    else:
+        input_path = validate_file_exists(INPUT_FILE)
+        if input_path is None:
+            sys.exit(1)
+        files = [input_path]
+    if not files:
+        print("No input files found")
+        sys.exit(1)
+    print(f"JSON backend: {JSON_BACKEND}")
+    error_count = check_files(files, args.jobs)
+    print(f"Scan finished. {error_count} error(s) in {len(files)} file(s).")
+    if error_count:
         sys.exit(1)
-    print(f"Checking file: {input_path}")
-    process_jsonl_file(input_path)
-    print("Scan finished.")
 
 def validate_file_exists(filepath):
     path = Path(filepath)
@@ -20,31 +38,88 @@ def validate_file_exists(filepath):
         return None
     return path
 
-def process_jsonl_file(path):
-    with path.open("r", encoding="utf-8") as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.rstrip("\r\n")
-            if not line.strip():
-                continue
-            analyze_line(line, line_num)
+def split_file(path, chunk_size=CHUNK_SIZE):
+    size = path.stat().st_size
+    chunks = []
+    start = 0
+    with path.open('rb') as f:
+        while start < size:
+            end = start + chunk_size
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            else:
+                end = size
+            chunks.append((str(path), start, end))
+            start = end
+    return chunks
+
+def check_chunk(chunk):
+    path, start, end = chunk
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = mm[start:end]
+    errors = []
+    for local_num, raw in enumerate(data.split(b'\n'), 1):
+        try:
+            fast_loads(raw)
+        except FAST_DECODE_ERRORS:
+            error = diagnose_raw_line(raw)
+            if error:
+                errors.append((local_num,) + error)
+    return data.count(b'\n'), errors
 
-def analyze_line(line, line_num):
+def diagnose_raw_line(raw):
+    raw = raw.rstrip(b'\r')
+    if not raw.strip():
+        return None
+    try:
+        line = raw.decode('utf-8')
+    except UnicodeDecodeError as e:
+        return f"invalid UTF-8: {e}", raw.decode('utf-8', 'replace'), []
     try:
         json.loads(line)
     except json.JSONDecodeError as e:
-        diagnose_error(line, line_num, e)
+        return str(e), line, collect_hints(line, e.pos)
+    return None
 
-def diagnose_error(line, line_num, error):
-    print(f"ERROR on line {line_num:5d}: {error}")
+def check_files(files, jobs=1):
+    chunks = [chunk for path in files for chunk in split_file(path)]
+    if jobs > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(check_chunk, chunks))
+    else:
+        results = [check_chunk(chunk) for chunk in chunks]
+    error_count = 0
+    current_path = None
+    line_offset = 0
+    for (path, _, _), (newline_count, errors) in zip(chunks, results):
+        if path != current_path:
+            current_path = path
+            line_offset = 0
+            print(f"Checking file: {path}")
+        for local_num, message, line, hints in errors:
+            print_error(line_offset + local_num, message, line, hints)
+        error_count += len(errors)
+        line_offset += newline_count
+    return error_count
+
+def print_error(line_num, message, line, hints):
+    print(f"ERROR on line {line_num:5d}: {message}")
     print(f"Content : {line}")
-    check_odd_quotes(line)
-    check_suspicious_characters(line, error.pos)
-    check_latex_commands(line)
-    check_control_characters(line)
+    for hint in hints:
+        print(hint)
+
+def collect_hints(line, error_pos):
+    hints = (check_odd_quotes(line),
+             check_suspicious_characters(line, error_pos),
+             check_latex_commands(line),
+             check_control_characters(line))
+    return [hint for hint in hints if hint]
 
 def check_odd_quotes(line):
     if '"' in line and line.count('"') % 2 == 1:
-        print("  odd number of quotes, likely unescaped or missing closing \"")
+        return "  odd number of quotes, likely unescaped or missing closing \""
 
 def check_suspicious_characters(line, error_pos):
     start = max(0, error_pos - 10)
@@ -52,17 +127,16 @@ def check_suspicious_characters(line, error_pos):
     window = line[start:end]
     suspicious = [c for c in window if ord(c) < 32 or c in '\\"']
     if suspicious:
-        print(f"  suspicious char(s) near error: {repr(''.join(suspicious))}")
+        return f"  suspicious char(s) near error: {repr(''.join(suspicious))}"
 
 def check_latex_commands(line):
     if "\\mathbb" in line or "\\mathbf" in line or "\\mathcal" in line:
-        print("  LaTeX command detected,  must be inside string and properly escaped")
-        print("  Example correct:  \"text with \\\\mathbb{R}\"")
+        return ("  LaTeX command detected,  must be inside string and properly escaped\n"
+                "  Example correct:  \"text with \\\\mathbb{R}\"")
 
 def check_control_characters(line):
     if any(ord(c) < 32 and c not in "\t\n\r" for c in line):
-        print("  control character(s) present (not allowed outside strings)")
+        return "  control character(s) present (not allowed outside strings)"
 
 if __name__ == "__main__":
     main()
-
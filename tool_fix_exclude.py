@@ -1,20 +1,50 @@
+import os
+import re
+import sys
 import json
+import argparse
+import threading
 import tkinter as tk
+from array import array
 from tkinter import filedialog, messagebox, ttk
+from jsonl_io import BlockWriter, JsonlError, iter_blocks, iter_lines, write_blocks
 
 ROWS = 8
+SNIPPET = 38
+INPUT_FILE = "input.json"
+KEY_LENGTH = 40
+LABEL_PATTERN = re.compile(rb'"label"\s*:\s*"([^"\\]*)"')
+TEXT_HEAD_PATTERN = re.compile(rb'"text"\s*:\s*"([^"]{0,12})')
+SKIP_LABELS = ("exclude", "footer", "header", "page_header")
+DROP_LABELS = ("exclude",)
+OPENING_QUOTES = "“‘„«\"'"
+HYPHENS = ("-", "\u00ad", "\u2010")
+HYPHEN_MARKERS = tuple(marker + b'"' for h in HYPHENS for marker in {h.encode("utf-8"), json.dumps(h)[1:-1].encode("ascii")})
 
 def main():
+    parser = argparse.ArgumentParser(description="Merge paragraphs split by excluded blocks, footers or page headers.")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE, help=f"JSONL file (default: {INPUT_FILE})")
+    parser.add_argument("-d", "--decisions", help="decisions file saved from an earlier review")
+    parser.add_argument("-o", "--output", help="write the merged file without opening the GUI")
+    parser.add_argument("--skip-labels", nargs="+", default=list(SKIP_LABELS), metavar="LABEL",
+                        help=f"labels a broken paragraph may span (default: {' '.join(SKIP_LABELS)}); {', '.join(DROP_LABELS)} blocks are dropped, others moved after the merged paragraph")
+    args = parser.parse_args()
+    if args.output:
+        apply_headless(args.input, args.output, args.decisions, args.skip_labels)
+        return
     root = tk.Tk()
     root.title("JSON Paragraph Merge Tool")
     root.geometry("1100x645")
-    root.original_blocks = None
-    root.merge_groups = None
+    root.input_path = args.input
+    root.group_index = None
     root.merge_decisions = None
+    root.page_cache = {}
     root.offset = 0
     menubar = tk.Menu(root)
     filemenu = tk.Menu(menubar, tearoff=0)
     filemenu.add_command(label="Save", command=lambda: save_all(root))
+    filemenu.add_command(label="Load decisions...", command=lambda: load_decisions_dialog(root))
+    filemenu.add_command(label="Save decisions...", command=lambda: save_decisions_dialog(root))
     filemenu.add_separator()
     filemenu.add_command(label="Exit", command=root.quit)
     menubar.add_cascade(label="File", menu=filemenu)
@@ -62,50 +92,61 @@ def main():
     btn_next.pack(side="left", padx=15)
     def load_file():
         try:
-            with open("input.json", "r", encoding="utf-8") as f:
-                lines = f.readlines()
+            group_index = GroupIndex.build(root.input_path, args.skip_labels)
         except FileNotFoundError:
-            info_label.config(text="input.json not found in current folder")
+            info_label.config(text=f"{root.input_path} not found")
             return
-        blocks = []
-        for i, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                blocks.append(json.loads(line))
-            except json.JSONDecodeError:
-                messagebox.showerror("Parse Error", f"Invalid JSON at line {i}")
-                return
-        merge_groups = find_all_merge_groups(blocks)
-        if not merge_groups:
+        except JsonlError as e:
+            messagebox.showerror("Parse Error", f"Invalid JSON at line {e.line_num}")
+            return
+        if not len(group_index):
             info_label.config(text="No potential broken paragraphs found")
             return
-        root.original_blocks = blocks
-        root.merge_groups = merge_groups
-        root.merge_decisions = [True] * len(merge_groups)
+        root.group_index = group_index
+        root.merge_decisions = group_index.default_flags()
+        root.page_cache = {}
         root.offset = 0
+        if args.decisions:
+            root.merge_decisions, matched = restore_flags(group_index, load_decisions(args.decisions))
+            messagebox.showinfo("Decisions", f"Restored {matched} of {len(group_index)} decisions from:\n{args.decisions}")
         refresh_page()
+    def page_texts(start):
+        texts = root.page_cache.get(start)
+        if texts is None:
+            texts = root.page_cache[start] = root.group_index.page_texts(start, ROWS)
+        return texts
+    def prefetch(start):
+        if start < len(root.group_index) and start not in root.page_cache:
+            index = root.group_index
+            threading.Thread(target=lambda: root.page_cache.setdefault(start, index.page_texts(start, ROWS)), daemon=True).start()
     def refresh_page():
-        total = len(root.merge_groups)
+        total = len(root.group_index)
         start = root.offset
         end = min(start + ROWS, total)
         info_label.config(text=f"Showing {start + 1}–{end} of {total}")
+        try:
+            texts = page_texts(start)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Read Error", f"Could not read blocks for this page:\n{e}")
+            return
+        for key in list(root.page_cache):
+            if abs(key - start) > ROWS:
+                root.page_cache.pop(key, None)
         for i in range(ROWS):
             row, left, mid, right = root.row_widgets[i]
             idx = start + i
             if idx < total:
-                group = root.merge_groups[idx]
-                prev_text = root.original_blocks[group["paragraph_indices"][0]]["text"]
-                cont_text = root.original_blocks[group["paragraph_indices"][-1]]["text"]
-                left.config(text=prev_text[-38:])
-                right.config(text=cont_text[:38])
+                prev_text, cont_text = texts[i]
+                left.config(text=prev_text[-SNIPPET:])
+                right.config(text=cont_text[:SNIPPET])
                 set_row_state(row, root.merge_decisions[idx])
                 row.pack(fill="x", pady=4)
             else:
                 row.pack_forget()
+        prefetch(start + ROWS)
+    root.refresh_page = refresh_page
     def go_next():
-        root.offset += ROWS if root.offset + ROWS < len(root.merge_groups) else 0
+        root.offset += ROWS if root.offset + ROWS < len(root.group_index) else 0
         refresh_page()
     def go_prev():
         root.offset -= ROWS if root.offset - ROWS >= 0 else 0
@@ -115,102 +156,240 @@ def main():
     load_file()
     root.mainloop()
 
-def find_all_merge_groups(blocks):
-    merge_groups = []
-    position = 0
-    while position < len(blocks):
-        group = try_find_merge_group_at(blocks, position)
-        if group:
-            merge_groups.append(group)
-            position = group["start_index"] + 1
-        else:
-            position += 1
-    return merge_groups
-
-def try_find_merge_group_at(blocks, start_pos):
-    if start_pos >= len(blocks):
-        return None
-    if blocks[start_pos].get("label") != "p":
-        return None
-    paragraph_indices = [start_pos]
-    exclude_indices = []
-    current_pos = start_pos + 1
-    while current_pos < len(blocks):
-        current_block = blocks[current_pos]
-        if current_block.get("label") == "exclude":
-            exclude_indices.append(current_pos)
-            current_pos += 1
+def is_continuation(text, after_hyphen=False):
+    if not text:
+        return False
+    if text[0].islower() or (after_hyphen and text[0].isalpha()):
+        return True
+    return text[0] in OPENING_QUOTES and len(text) > 1 and text[1].islower()
+
+def parse_line(line_num, line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise JsonlError(line_num, e) from e
+
+def ends_with_hyphen(line_num, line):
+    if not any(marker in line for marker in HYPHEN_MARKERS):
+        return False
+    return parse_line(line_num, line).get("text", "").endswith(HYPHENS)
+
+def read_text_head(line_num, line):
+    m = TEXT_HEAD_PATTERN.search(line)
+    if not m:
+        return ""
+    head = m.group(1)
+    if b"\\" not in head:
+        return head.decode("utf-8", "ignore")
+    try:
+        return json.loads(b'"' + head + b'"')
+    except ValueError:
+        return parse_line(line_num, line).get("text", "")
+
+def scan_records(path):
+    with open(path, "rb") as f:
+        idx = 0
+        offset = 0
+        for line_num, line in enumerate(f, 1):
+            line_offset = offset
+            offset += len(line)
+            if not line.strip():
+                continue
+            m = LABEL_PATTERN.search(line)
+            label = m.group(1).decode("utf-8") if m else None
+            if label == "p":
+                yield idx, line_offset, label, read_text_head(line_num, line), ends_with_hyphen(line_num, line)
+            else:
+                yield idx, line_offset, label, "", False
+            idx += 1
+
+def iter_merge_groups(records, skip_labels=SKIP_LABELS):
+    skip_labels = frozenset(skip_labels)
+    previous = None
+    skipped = 0
+    for idx, offset, label, head, hyphenated in records:
+        if label in skip_labels:
+            skipped += 1
             continue
-        if current_block.get("label") == "p":
-            text_content = current_block.get("text", "")
-            if text_content and len(text_content) > 0:
-                first_char = text_content[0]
-                if first_char.islower():
-                    paragraph_indices.append(current_pos)
-                    break
-                if first_char == '“' and len(text_content) > 1 and text_content[1].islower():
-                    paragraph_indices.append(current_pos)
-                    break
-        break
-    if len(paragraph_indices) < 2:
-        return None
-    if len(exclude_indices) == 0:
-        return None
-    return {
-        "paragraph_indices": paragraph_indices,
-        "exclude_indices": exclude_indices,
-        "start_index": start_pos,
-        "end_index": paragraph_indices[-1]
-    }
+        if label == "p":
+            if previous is not None and skipped and is_continuation(head, previous[2]):
+                yield previous[0], previous[1], idx, offset, previous[2]
+            previous = (idx, offset, hyphenated)
+        else:
+            previous = None
+        skipped = 0
+
+class GroupIndex:
+    def __init__(self, path):
+        self.path = path
+        self.start = array('q')
+        self.end = array('q')
+        self.start_offset = array('q')
+        self.end_offset = array('q')
+        self.hyphenated = bytearray()
+
+    @classmethod
+    def build(cls, path, skip_labels=SKIP_LABELS):
+        index = cls(path)
+        for start, start_offset, end, end_offset, hyphenated in iter_merge_groups(scan_records(path), skip_labels):
+            index.start.append(start)
+            index.start_offset.append(start_offset)
+            index.end.append(end)
+            index.end_offset.append(end_offset)
+            index.hyphenated.append(hyphenated)
+        return index
+
+    def __len__(self):
+        return len(self.start)
+
+    def iter_texts(self, first=0, last=None):
+        last = len(self) if last is None else min(last, len(self))
+        with open(self.path, "rb") as f:
+            for i in range(first, last):
+                f.seek(self.start_offset[i])
+                prev_text = json.loads(f.readline()).get("text", "")
+                f.seek(self.end_offset[i])
+                cont_text = json.loads(f.readline()).get("text", "")
+                yield prev_text, cont_text
+
+    def page_texts(self, first, rows):
+        return [(prev_text[-SNIPPET:], cont_text[:SNIPPET]) for prev_text, cont_text in self.iter_texts(first, first + rows)]
+
+    def default_flags(self):
+        return bytearray(not hyphenated for hyphenated in self.hyphenated)
+
+    def decisions(self, flags):
+        return list(zip(self.start, self.end, flags))
+
+def merge_text(text, source_text, use_space):
+    if not use_space and text.endswith(HYPHENS) and not source_text[:1].isupper():
+        return text[:-1] + source_text
+    return text + (" " if use_space else "") + source_text
+
+def write_merged(src_path, path, decisions):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        count = write_merged_lines(src_path, tmp_path, decisions)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+def write_merged_lines(src_path, path, decisions):
+    decisions = iter(sorted(decisions))
+    upcoming = next(decisions, None)
+    pending = None
+    deferred = []
+    end = use_space = None
+    with BlockWriter(path, separators=(", ", ": ")) as writer:
+        for idx, (line_num, line) in enumerate(iter_lines(src_path)):
+            if pending is not None:
+                if idx < end:
+                    if parse_line(line_num, line).get("label") not in DROP_LABELS:
+                        deferred.append(line)
+                    continue
+                pending["text"] = merge_text(pending["text"], parse_line(line_num, line).get("text", ""), use_space)
+                if upcoming and upcoming[0] == idx:
+                    _, end, use_space = upcoming
+                    upcoming = next(decisions, None)
+                    continue
+                writer.write(pending)
+                pending = None
+                for deferred_line in deferred:
+                    writer.write_line(deferred_line)
+                deferred = []
+            elif upcoming and upcoming[0] == idx:
+                pending = parse_line(line_num, line)
+                _, end, use_space = upcoming
+                upcoming = next(decisions, None)
+            else:
+                writer.write_line(line)
+        if pending is not None:
+            writer.write(pending)
+        for deferred_line in deferred:
+            writer.write_line(deferred_line)
+    return writer.count
+
+def group_key(prev_text, cont_text):
+    return prev_text[-KEY_LENGTH:], cont_text[:KEY_LENGTH]
+
+def decision_records(group_index, flags):
+    for i, texts in enumerate(group_index.iter_texts()):
+        before, after = group_key(*texts)
+        yield {"start": group_index.start[i], "end": group_index.end[i], "use_space": bool(flags[i]),
+               "before": before, "after": after}
+
+def load_decisions(path):
+    return {(record["before"], record["after"]): record["use_space"] for record in iter_blocks(path)}
+
+def restore_flags(group_index, saved):
+    flags = group_index.default_flags()
+    matched = 0
+    for i, texts in enumerate(group_index.iter_texts()):
+        use_space = saved.get(group_key(*texts))
+        if use_space is not None:
+            flags[i] = bool(use_space)
+            matched += 1
+    return flags, matched
+
+def apply_headless(input_path, output_path, decisions_path=None, skip_labels=SKIP_LABELS):
+    try:
+        group_index = GroupIndex.build(input_path, skip_labels)
+        flags = group_index.default_flags()
+        if decisions_path:
+            try:
+                saved = load_decisions(decisions_path)
+            except (KeyError, TypeError) as e:
+                print(f"Invalid decisions file {decisions_path}: every record needs before, after and use_space ({e})")
+                sys.exit(1)
+            flags, matched = restore_flags(group_index, saved)
+            print(f"Restored {matched} of {len(group_index)} decisions from {decisions_path}")
+        count = write_merged(input_path, output_path, group_index.decisions(flags))
+    except JsonlError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Merged {len(group_index)} group(s), wrote {count} blocks to {output_path}")
+
+def save_decisions_dialog(root):
+    if not root.group_index:
+        return
+    path = filedialog.asksaveasfilename(title="Save decisions", initialfile="merge_decisions.json", defaultextension=".json", filetypes=[("JSON Lines", "*.json"), ("All files", "*.*")])
+    if not path:
+        return
+    try:
+        write_blocks(path, decision_records(root.group_index, root.merge_decisions))
+    except Exception as e:
+        messagebox.showerror("Save failed", f"Could not write file:\n{str(e)}")
+
+def load_decisions_dialog(root):
+    if not root.group_index:
+        return
+    path = filedialog.askopenfilename(title="Load decisions", filetypes=[("JSON Lines", "*.json"), ("All files", "*.*")])
+    if not path:
+        return
+    try:
+        saved = load_decisions(path)
+    except (OSError, JsonlError, KeyError, TypeError) as e:
+        messagebox.showerror("Load failed", f"Could not read decisions:\n{str(e)}")
+        return
+    try:
+        root.merge_decisions, matched = restore_flags(root.group_index, saved)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Load failed", f"Could not read input blocks:\n{str(e)}")
+        return
+    root.refresh_page()
+    messagebox.showinfo("Decisions", f"Restored {matched} of {len(root.group_index)} decisions.")
 
 def save_all(root):
-    if not root.original_blocks or not root.merge_groups:
+    if not root.group_index:
         return
-    blocks_with_metadata = []
-    for original_index, block_data in enumerate(root.original_blocks):
-        blocks_with_metadata.append({
-            "original_index": original_index,
-            "data": dict(block_data),
-            "action": "keep"
-        })
-    for group_index, use_space in enumerate(root.merge_decisions):
-        group = root.merge_groups[group_index]
-        paragraph_positions = group["paragraph_indices"]
-        exclude_positions = group["exclude_indices"]
-        primary_position = paragraph_positions[0]
-        blocks_with_metadata[primary_position]["action"] = "merge_target"
-        blocks_with_metadata[primary_position]["merge_sources"] = paragraph_positions[1:]
-        blocks_with_metadata[primary_position]["use_space"] = use_space
-        for para_pos in paragraph_positions[1:]:
-            blocks_with_metadata[para_pos]["action"] = "delete"
-        for excl_pos in exclude_positions:
-            blocks_with_metadata[excl_pos]["action"] = "delete"
-    final_blocks = []
-    for block_meta in blocks_with_metadata:
-        if block_meta["action"] == "delete":
-            continue
-        if block_meta["action"] == "merge_target":
-            merged_text = block_meta["data"]["text"]
-            use_space = block_meta.get("use_space", True)
-            for source_pos in block_meta["merge_sources"]:
-                source_text = root.original_blocks[source_pos].get("text", "")
-                if not use_space and merged_text.endswith("-"):
-                    merged_text = merged_text[:-1] + source_text
-                else:
-                    merged_text = merged_text + (" " if use_space else "") + source_text
-            result_block = dict(block_meta["data"])
-            result_block["text"] = merged_text
-            final_blocks.append(result_block)
-        else:
-            final_blocks.append(block_meta["data"])
     save_path = filedialog.asksaveasfilename(title="Save merged file", initialfile="merged.json", defaultextension=".json", filetypes=[("JSON Lines", "*.json"), ("All files", "*.*")])
     if not save_path:
         return
     try:
-        with open(save_path, "w", encoding="utf-8") as f:
-            for block in final_blocks:
-                json.dump(block, f, ensure_ascii=False, separators=(", ", ": "))
-                f.write("\n")
+        write_merged(root.input_path, save_path, root.group_index.decisions(root.merge_decisions))
         messagebox.showinfo("Done", f"Saved successfully:\n{save_path}")
     except Exception as e:
         messagebox.showerror("Save failed", f"Could not write file:\n{str(e)}")
@@ -1,25 +1,111 @@
 import tkinter as tk
 from tkinter import messagebox
 import re
-import json
 import os
+import json
+import argparse
+from bisect import bisect_left
+from jsonl_io import iter_blocks, rewrite_blocks
+from footnote_chain import build_number_index, detect_chains, find_forward_chain
+from splice import wrap_sup
+from token_store import MAX_DIGITS, TokenStore
+from virtual_list import VirtualList
 
 CONTEXT_LENGTH = 27
 FILTER_YEARS = False
+AUTO_CONFIDENCE = 0.8
+REVIEW_SNIPPETS = 5
+CHAPTER_LABELS = ("h1", "h2")
+NUMBER_PATTERN = re.compile(r"\d+")
+MULTI_SPACE = re.compile(r" {2,}")
 
 def to_bold(num_str):
     bold_digits = {'0':'𝟎','1':'𝟏','2':'𝟐','3':'𝟑','4':'𝟒','5':'𝟓','6':'𝟔','7':'𝟕','8':'𝟖','9':'𝟗'}
     return ''.join(bold_digits.get(ch, ch) for ch in num_str)
 
+def is_year(text):
+    if FILTER_YEARS:
+        return bool(re.match(r"^(19[0-9]\d|20[0-9]\d|18[0-9]\d)$", text))
+    else:
+        return False
+
+def make_snippet(text, start, end):
+    snippet = (text[max(0, start - 33):start] +
+               to_bold(text[start:end]) +
+               text[end:min(len(text), end + CONTEXT_LENGTH)])
+    snippet = snippet.replace("\n", " ").strip()
+    return MULTI_SPACE.sub(" ", snippet)
+
+def extract_tokens(blocks):
+    tokens = TokenStore(lambda block_idx: blocks[block_idx].get("text", ""), make_snippet)
+    for block_idx, block in enumerate(blocks):
+        if block.get("label") == "exclude":
+            continue
+        if block.get("label") in ["h1", "h2", "h3"]:
+            continue
+        text = block.get("text", "")
+        for m in NUMBER_PATTERN.finditer(text):
+            num_str = m.group()
+            if len(num_str) > MAX_DIGITS or is_year(num_str):
+                continue
+            tokens.append(block_idx, m.start(), m.end(), int(num_str))
+    return tokens
+
+def chapter_ids(blocks):
+    chapter = 0
+    ids = []
+    for block in blocks:
+        if block.get("label") in CHAPTER_LABELS:
+            chapter += 1
+        ids.append(chapter)
+    return ids
+
+def apply_sup(blocks, tokens, selected_indices):
+    spans_by_block = {}
+    for i in selected_indices:
+        spans_by_block.setdefault(tokens.block_idx[i], []).append((tokens.start[i], tokens.end[i]))
+    for bidx, spans in spans_by_block.items():
+        blocks[bidx]["text"] = wrap_sup(blocks[bidx]["text"], sorted(spans))
+    return {bidx: blocks[bidx] for bidx in spans_by_block}
+
+def output_path(filename, suffix):
+    base, ext = os.path.splitext(filename)
+    return base + suffix + ext
+
+def auto_detect(filename, threshold=AUTO_CONFIDENCE, review_only=False):
+    blocks = list(iter_blocks(filename))
+    tokens = extract_tokens(blocks)
+    block_chapters = chapter_ids(blocks)
+    chains = detect_chains(tokens.number, [block_chapters[b] for b in tokens.block_idx])
+    applied = [chain for chain in chains if chain["confidence"] >= threshold and not review_only]
+    review_path = output_path(filename, "_footnotes_review")
+    with open(review_path, "w", encoding="utf-8") as f:
+        for chain in chains:
+            json.dump({
+                "chapter": chain["chapter"],
+                "start": chain["start"],
+                "end": chain["end"],
+                "length": len(chain["positions"]),
+                "confidence": round(chain["confidence"], 3),
+                "applied": chain in applied,
+                "snippets": [tokens.snippet(p) for p in chain["positions"][:REVIEW_SNIPPETS]]}, f, ensure_ascii=False)
+            f.write("\n")
+    if not applied:
+        return None, review_path, chains
+    changed = apply_sup(blocks, tokens, [p for chain in applied for p in chain["positions"]])
+    sup_path = output_path(filename, "_sup")
+    rewrite_blocks(filename, sup_path, changed)
+    return sup_path, review_path, chains
+
 class FootnoteSelector(tk.Tk):
-    def __init__(self):
-        filename = input("Input file (input.json): ") or 'input.json'
+    def __init__(self, filename):
         super().__init__()
         self.title("Footnote Reference Selector")
         self.geometry("740x700")
         self.filename = filename
         self.blocks = []
-        self.tokens = []
+        self.tokens = extract_tokens([])
+        self.number_index = {}
         self.load_file()
         self.extract_tokens()
         self.create_widgets()
@@ -27,149 +113,67 @@ class FootnoteSelector(tk.Tk):
     def load_file(self):
         self.blocks = []
         try:
-            with open(self.filename, "r", encoding="utf-8") as f:
-                for line in f:
-                    if not line.strip():
-                        continue
-                    block = json.loads(line)
-                    self.blocks.append(block)
+            self.blocks = list(iter_blocks(self.filename))
         except Exception as e:
             messagebox.showerror("File Error", f"Could not load {self.filename}:\n{e}")
             self.blocks = []
 
     def is_year(self, text):
-        if FILTER_YEARS:
-            return bool(re.match(r"^(19[0-9]\d|20[0-9]\d|18[0-9]\d)$", text))
-        else:
-            return False
+        return is_year(text)
 
     def extract_tokens(self):
-        self.tokens = []
-        pattern = re.compile(r"\d+")
-        for block_idx, block in enumerate(self.blocks):
-            if block.get("label") == "exclude":
-                continue
-            if block.get("label") in ["h1", "h2", "h3"]:
-                continue
-            text = block.get("text", "")
-            for m in pattern.finditer(text):
-                num_str = m.group()
-                if self.is_year(num_str):
-                    continue
-                num_val = int(num_str)
-                snippet = (text[max(0, m.start() - 33):m.start()] +
-                           to_bold(num_str) +
-                           text[m.end():min(len(text), m.end() + CONTEXT_LENGTH)])
-                snippet = snippet.replace("\n", " ").strip()
-                while "  " in snippet:
-                    snippet = snippet.replace("  ", " ")
-                self.tokens.append({
-                    "block_idx": block_idx,
-                    "local_start": m.start(),
-                    "local_end": m.end(),
-                    "number": num_val,
-                    "text": num_str,
-                    "snippet": snippet,
-                    "is_year": False})
+        self.tokens = extract_tokens(self.blocks)
+        self.number_index = build_number_index(self.tokens.number)
 
     def create_widgets(self):
-        frame = tk.Frame(self)
-        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        self.listbox = tk.Listbox(frame, selectmode=tk.MULTIPLE, font=("Consolas", 10), exportselection=False)
-        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.listbox.bind("<Button-1>", self.on_click)
-        self.listbox.bind("<<ListboxSelect>>", self.on_selection_change)
-        scrollbar = tk.Scrollbar(frame, orient=tk.VERTICAL, command=self.listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.listbox.config(yscrollcommand=scrollbar.set)
-        for idx, token in enumerate(self.tokens):
-            self.listbox.insert(tk.END, token["snippet"])
-            if token["number"] < 1000:
-                self.listbox.itemconfig(idx, {'fg': 'red'})
+        self.listbox = VirtualList(self, lambda idx: self.tokens.snippet(idx), self.token_color, self.on_click)
+        self.listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.listbox.set_row_count(len(self.tokens))
         button_frame = tk.Frame(self)
         button_frame.pack(fill=tk.X, padx=10, pady=5)
         process_button = tk.Button(button_frame, text="Apply <sup> Tags", command=self.apply_sup_tags)
         process_button.pack(side=tk.LEFT, padx=5)
+        tk.Label(button_frame, text="Block:").pack(side=tk.LEFT, padx=(15, 2))
+        self.jump_var = tk.StringVar()
+        jump_entry = tk.Entry(button_frame, textvariable=self.jump_var, width=8)
+        jump_entry.pack(side=tk.LEFT)
+        jump_entry.bind("<Return>", self.jump_to_block)
+        tk.Button(button_frame, text="Go", command=self.jump_to_block).pack(side=tk.LEFT, padx=2)
         quit_button = tk.Button(button_frame, text="Quit", command=self.destroy)
         quit_button.pack(side=tk.RIGHT, padx=5)
 
-    def on_click(self, event):
-        index = self.listbox.nearest(event.y)
-        self.listbox.activate(index)
-        for i in range(index + 1, len(self.tokens)):
-            self.listbox.selection_clear(i)
-        if index in self.listbox.curselection():
-            self.listbox.selection_clear(index)
+    def token_color(self, idx):
+        return 'red' if self.tokens.number[idx] < 1000 else None
+
+    def jump_to_block(self, event=None):
+        try:
+            block = int(self.jump_var.get())
+        except ValueError:
+            return
+        self.listbox.scroll_to(bisect_left(self.tokens.block_idx, block))
+
+    def on_click(self, index):
+        self.listbox.clear_after(index)
+        if index in self.listbox.selected:
+            self.listbox.selected.discard(index)
         else:
-            self.listbox.selection_set(index)
-            self.on_selection_change(None)
-        return "break"
+            self.listbox.selected.add(index)
+            self.listbox.selected.update(self.find_forward_consecutive_indices(index))
+        self.listbox.refresh()
 
     def find_forward_consecutive_indices(self, anchor_index):
-        result_indices = []
-        anchor_token = self.tokens[anchor_index]
-        anchor_number = anchor_token["number"]
-        next_expected = anchor_number + 1
-        current_search_start = anchor_index + 1
-        while current_search_start < len(self.tokens):
-            found = False
-            for i in range(current_search_start, len(self.tokens)):
-                token = self.tokens[i]
-                if token["number"] == next_expected:
-                    result_indices.append(i)
-                    next_expected += 1
-                    current_search_start = i + 1
-                    found = True
-                    break
-            if not found:
-                break
-        return result_indices
-
-    def on_selection_change(self, event):
-        self.listbox.unbind("<<ListboxSelect>>")
-        try:
-            selected_indices = list(self.listbox.curselection())
-            if not selected_indices:
-                return
-            try:
-                anchor_index = self.listbox.index(tk.ACTIVE)
-            except Exception:
-                anchor_index = max(selected_indices)
-            if anchor_index not in selected_indices:
-                selected_indices.append(anchor_index)
-            for i in range(anchor_index + 1, len(self.tokens)):
-                self.listbox.selection_clear(i)
-            forward_indices = self.find_forward_consecutive_indices(anchor_index)
-            for idx in forward_indices:
-                self.listbox.selection_set(idx)
-        finally:
-            self.listbox.bind("<<ListboxSelect>>", self.on_selection_change)
+        anchor_number = self.tokens.number[anchor_index]
+        return find_forward_chain(self.number_index, anchor_index, anchor_number)
 
     def apply_sup_tags(self):
-        selected_indices = self.listbox.curselection()
+        selected_indices = self.listbox.sorted_selection()
         if not selected_indices:
             messagebox.showinfo("No Selection", "No tokens selected. Please select tokens to wrap in <sup> tags.")
             return
-        selected_tokens = [self.tokens[i] for i in selected_indices]
-        tokens_by_block = {}
-        for token in selected_tokens:
-            bidx = token["block_idx"]
-            tokens_by_block.setdefault(bidx, []).append(token)
-        for bidx, btokens in tokens_by_block.items():
-            btokens.sort(key=lambda t: t["local_start"], reverse=True)
-            text = self.blocks[bidx]["text"]
-            for token in btokens:
-                start = token["local_start"]
-                end = token["local_end"]
-                text = text[:start] + f"<sup>{token['text']}</sup>" + text[end:]
-            self.blocks[bidx]["text"] = text
-        base, ext = os.path.splitext(self.filename)
-        output_filename = base + "_sup" + ext
+        changed = apply_sup(self.blocks, self.tokens, selected_indices)
+        output_filename = output_path(self.filename, "_sup")
         try:
-            with open(output_filename, "w", encoding="utf-8") as f:
-                for block in self.blocks:
-                    json.dump(block, f, ensure_ascii=False)
-                    f.write("\n")
+            rewrite_blocks(self.filename, output_filename, changed)
             messagebox.showinfo("Success", f"Processed file saved as '{output_filename}'.")
         except Exception as e:
             messagebox.showerror("Write Error", f"Could not write output file:\n{e}")
@@ -177,10 +181,23 @@ class FootnoteSelector(tk.Tk):
     def reload_file(self):
         self.load_file()
         self.extract_tokens()
-        self.listbox.delete(0, tk.END)
-        for token in self.tokens:
-            self.listbox.insert(tk.END, token["snippet"])
+        self.listbox.set_row_count(len(self.tokens))
 
-if __name__ == '__main__':
-    app = FootnoteSelector()
+def main():
+    parser = argparse.ArgumentParser(description="Wrap footnote reference numbers in <sup> tags.")
+    parser.add_argument("inputs", nargs="*", help="JSONL files (prompted for when omitted)")
+    parser.add_argument("--auto", action="store_true", help="detect footnote chains without the GUI")
+    parser.add_argument("--threshold", type=float, default=AUTO_CONFIDENCE, help="minimum chain confidence to apply in --auto mode")
+    parser.add_argument("--review-only", action="store_true", help="in --auto mode, only write the review file")
+    args = parser.parse_args()
+    if args.auto:
+        for filename in args.inputs or ['input.json']:
+            sup_path, review_path, chains = auto_detect(filename, args.threshold, args.review_only)
+            print(f"{filename}: {len(chains)} chain(s), review in {review_path}" + (f", saved {sup_path}" if sup_path else ""))
+        return
+    filename = args.inputs[0] if args.inputs else input("Input file (input.json): ") or 'input.json'
+    app = FootnoteSelector(filename)
     app.mainloop()
+
+if __name__ == '__main__':
+    main()
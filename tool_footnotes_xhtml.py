@@ -2,17 +2,187 @@ import tkinter as tk
 from tkinter import messagebox, simpledialog
 import re
 import os
+import sys
 import glob
+import json
+import queue
+import hashlib
+import threading
+import zipfile
+import argparse
+import posixpath
+import xml.etree.ElementTree as ET
+from bisect import bisect_left
+from itertools import repeat
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from footnote_chain import build_number_index, detect_chains, find_forward_chain
+from jsonl_io import expand_inputs
+from splice import wrap_sup
+from token_store import TokenStore
+from virtual_list import VirtualList
+from xhtml_scanner import iter_digit_runs
 
 CONTEXT_LENGTH = 27
 FILTER_YEARS = False
+MAX_DIGITS = 3
+SKIP_ELEMENTS = {"head", "title", "script", "style", "sup"}
+AUTO_CONFIDENCE = 0.8
+DOCUMENT_SUFFIXES = ('.xhtml', '.html', '.htm')
+BATCH_SUFFIXES = DOCUMENT_SUFFIXES + ('.epub',)
+MANIFEST_NAME = ".footnotes_manifest.json"
 
 def to_bold(num_str):
     bold_digits = {'0':'𝟎','1':'𝟏','2':'𝟐','3':'𝟑','4':'𝟒','5':'𝟓',
                    '6':'𝟔','7':'𝟕','8':'𝟖','9':'𝟗'}
     return ''.join(bold_digits.get(ch, ch) for ch in num_str)
 
+def make_snippet(content, start, end):
+    num_str = content[start:end]
+    snippet = content[max(0, start - 36):min(len(content), end + CONTEXT_LENGTH)]
+    snippet = snippet.replace("\r", " ").replace("\n", " ").strip()
+    while "  " in snippet:
+        snippet = snippet.replace("  ", " ")
+    return snippet.replace(num_str, to_bold(num_str), 1)
+
+def extract_candidates(content, tokens, doc_idx=0):
+    for start, end, stack in iter_digit_runs(content):
+        if end - start > MAX_DIGITS or not SKIP_ELEMENTS.isdisjoint(stack):
+            continue
+        num_str = content[start:end]
+        if FILTER_YEARS and re.match(r"^(19\d{2}|20\d{2})$", num_str):
+            continue
+        tokens.append(doc_idx, start, end, int(num_str))
+    return tokens
+
+def tag_documents(contents, threshold=AUTO_CONFIDENCE):
+    tokens = TokenStore(contents.__getitem__, make_snippet)
+    for doc_idx, content in enumerate(contents):
+        extract_candidates(content, tokens, doc_idx)
+    chains = detect_chains(tokens.number, tokens.block_idx)
+    applied = [chain for chain in chains if chain["confidence"] >= threshold]
+    spans_by_doc = {}
+    for chain in applied:
+        for p in chain["positions"]:
+            spans_by_doc.setdefault(tokens.block_idx[p], []).append((tokens.start[p], tokens.end[p]))
+    changed = {}
+    for doc_idx, spans in spans_by_doc.items():
+        changed[doc_idx] = wrap_sup(contents[doc_idx], sorted(spans))
+    summary = {"candidates": len(tokens), "chains": len(chains), "applied": len(applied),
+               "wrapped": sum(len(spans) for spans in spans_by_doc.values())}
+    return changed, summary
+
+def write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+class SessionManifest:
+    def __init__(self, folder):
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.entries = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_done(self, name, digest):
+        entry = self.entries.get(name)
+        return entry is not None and entry.get("hash") == digest
+
+    def record(self, name, digest, status):
+        self.entries[name] = {"hash": digest, "status": status}
+
+    def save(self):
+        write_atomic(self.path, json.dumps(self.entries, indent=1, ensure_ascii=False).encode("utf-8"))
+
+def epub_documents(zf):
+    names = [name for name in zf.namelist() if name.lower().endswith(DOCUMENT_SUFFIXES)]
+    try:
+        container = ET.fromstring(zf.read("META-INF/container.xml"))
+        opf_path = next(el.get("full-path") for el in container.iter() if el.tag.endswith("rootfile"))
+        opf = ET.fromstring(zf.read(opf_path))
+    except (KeyError, StopIteration, ET.ParseError):
+        return sorted(names)
+    base = posixpath.dirname(opf_path)
+    manifest = {el.get("id"): posixpath.normpath(posixpath.join(base, el.get("href", "")))
+                for el in opf.iter() if el.tag.endswith("}item") or el.tag == "item"}
+    spine = [manifest.get(el.get("idref")) for el in opf.iter() if el.tag.endswith("itemref")]
+    ordered = [name for name in spine if name in names]
+    return ordered + sorted(set(names) - set(ordered))
+
+def process_epub(path, threshold, dry_run):
+    with zipfile.ZipFile(path) as zf:
+        names = []
+        contents = []
+        for name in epub_documents(zf):
+            try:
+                contents.append(zf.read(name).decode("utf-8"))
+            except UnicodeDecodeError:
+                continue
+            names.append(name)
+        changed, summary = tag_documents(contents, threshold)
+        if changed and not dry_run:
+            replaced = {names[doc_idx]: content.encode("utf-8") for doc_idx, content in changed.items()}
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with zipfile.ZipFile(tmp_path, 'w') as out:
+                for info in zf.infolist():
+                    out.writestr(info, replaced.get(info.filename) or zf.read(info))
+    if changed and not dry_run:
+        os.replace(tmp_path, path)
+    summary["documents"] = len(contents)
+    return summary
+
+def process_document(path, threshold, dry_run):
+    with open(path, 'rb') as f:
+        content = f.read().decode("utf-8")
+    changed, summary = tag_documents([content], threshold)
+    if changed and not dry_run:
+        write_atomic(path, changed[0].encode("utf-8"))
+    summary["documents"] = 1
+    return summary
+
+def process_path(path, threshold=AUTO_CONFIDENCE, dry_run=False):
+    try:
+        if path.lower().endswith('.epub'):
+            summary = process_epub(path, threshold, dry_run)
+        else:
+            summary = process_document(path, threshold, dry_run)
+    except (OSError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+        return {"path": path, "error": str(e)}
+    summary["path"] = path
+    return summary
+
+def print_summary(summary, dry_run=False):
+    if "error" in summary:
+        print(f"{summary['path']}: ERROR {summary['error']}")
+        return
+    saved = "" if dry_run or not summary["wrapped"] else ", saved"
+    print(f"{summary['path']}: {summary['documents']} document(s), {summary['candidates']} candidate(s), "
+          f"{summary['chains']} chain(s), {summary['applied']} applied, {summary['wrapped']} wrapped{saved}")
+
+def run_batch(files, threshold=AUTO_CONFIDENCE, dry_run=False, jobs=1):
+    paths = [str(p) for p in files]
+    jobs = max(1, min(jobs, len(paths)))
+    errors = 0
+    wrapped = 0
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            summaries = list(pool.map(process_path, paths, repeat(threshold), repeat(dry_run)))
+    else:
+        summaries = map(process_path, paths, repeat(threshold), repeat(dry_run))
+    for summary in summaries:
+        print_summary(summary, dry_run)
+        errors += "error" in summary
+        wrapped += summary.get("wrapped", 0)
+    print(f"Processed {len(paths)} file(s): {wrapped} number(s) wrapped, {errors} error(s).")
+    return errors
+
 class FootnoteXHTMLProcessor(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -20,28 +190,34 @@ class FootnoteXHTMLProcessor(tk.Tk):
         self.geometry("780x720")
         self.current_file = None
         self.current_content = ""
-        self.header_end_pos = 0
-        self.tokens = []
+        self.current_data = b""
+        self.manifest = None
+        self.resumed = 0
+        self.write_queue = queue.Queue()
+        self.write_errors = queue.Queue()
+        self.writer = threading.Thread(target=self.write_worker, daemon=True)
+        self.writer.start()
+        self.protocol("WM_DELETE_WINDOW", self.quit_session)
+        self.tokens = TokenStore(self.content_of, make_snippet)
+        self.number_index = {}
         self.create_widgets()
         self.ask_and_load_first_file()
+        self.poll_write_errors()
 
     def create_widgets(self):
-        frame = tk.Frame(self)
-        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        self.listbox = tk.Listbox(frame, selectmode=tk.MULTIPLE,
-                                  font=("Consolas", 10), exportselection=False)
-        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.listbox.bind("<Button-1>", self.on_listbox_click)
-        self.listbox.bind("<<ListboxSelect>>", self.on_selection_change)
-        scrollbar = tk.Scrollbar(frame, orient=tk.VERTICAL, command=self.listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.listbox.config(yscrollcommand=scrollbar.set)
+        self.listbox = VirtualList(self, lambda idx: self.tokens.snippet(idx), on_click=self.on_listbox_click)
+        self.listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         btn_frame = tk.Frame(self)
         btn_frame.pack(fill=tk.X, padx=10, pady=6)
         tk.Button(btn_frame, text="Apply <sup> → Save", command=self.apply_and_save).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Skip this file", command=self.skip_file).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Next file", command=self.load_next_file).pack(side=tk.LEFT, padx=5)
-        tk.Button(btn_frame, text="Quit", command=self.destroy).pack(side=tk.RIGHT, padx=5)
+        tk.Button(btn_frame, text="Quit", command=self.quit_session).pack(side=tk.RIGHT, padx=5)
+        self.jump_var = tk.StringVar()
+        jump_entry = tk.Entry(btn_frame, textvariable=self.jump_var, width=8)
+        jump_entry.pack(side=tk.RIGHT, padx=2)
+        jump_entry.bind("<Return>", self.jump_to_line)
+        tk.Label(btn_frame, text="Line:").pack(side=tk.RIGHT)
         self.status_var = tk.StringVar(value="No file loaded")
         tk.Label(self, textvariable=self.status_var, anchor="w", padx=10).pack(fill=tk.X, pady=(0,4))
 
@@ -53,168 +229,153 @@ class FootnoteXHTMLProcessor(tk.Tk):
             folder = folder.strip().rstrip('/').rstrip('\\')
         if not os.path.isdir(folder):
             messagebox.showerror("Invalid folder", f"Folder does not exist:\n{folder}")
-            self.destroy()
+            self.quit_session()
             return
         xhtml_files = glob.glob(os.path.join(folder, "*.xhtml"))
         html_files = glob.glob(os.path.join(folder, "*.html"))
         self.xhtml_files = sorted(xhtml_files + html_files)
         if not self.xhtml_files:
             messagebox.showerror("No files", f"No .xhtml or .html files found in:\n{folder}")
-            self.destroy()
+            self.quit_session()
             return
+        self.manifest = SessionManifest(folder)
         self.file_index = 0
         self.load_current_file()
 
     def load_current_file(self):
-        if self.file_index >= len(self.xhtml_files):
-            messagebox.showinfo("Finished", "All files processed.")
-            self.destroy()
-            return
-        self.current_file = self.xhtml_files[self.file_index]
-        self.status_var.set(f"File {self.file_index+1}/{len(self.xhtml_files)}: {os.path.basename(self.current_file)}")
+        while True:
+            if self.file_index >= len(self.xhtml_files):
+                messagebox.showinfo("Finished", "All files processed.")
+                self.quit_session()
+                return
+            self.current_file = self.xhtml_files[self.file_index]
+            try:
+                with open(self.current_file, "rb") as f:
+                    self.current_data = f.read()
+                self.current_content = self.current_data.decode("utf-8")
+            except Exception as e:
+                messagebox.showerror("Read error", f"Cannot read file:\n{self.current_file}\n{e}")
+                self.file_index += 1
+                continue
+            if not self.manifest.is_done(os.path.basename(self.current_file), content_hash(self.current_data)):
+                break
+            self.resumed += 1
+            self.file_index += 1
+        resumed = f" ({self.resumed} already done)" if self.resumed else ""
+        self.status_var.set(f"File {self.file_index+1}/{len(self.xhtml_files)}: {os.path.basename(self.current_file)}{resumed}")
+        self.extract_potential_footnotes()
+        self.listbox.set_row_count(len(self.tokens))
+
+    def content_of(self, block_idx):
+        return self.current_content
+
+    def jump_to_line(self, event=None):
         try:
-            with open(self.current_file, "r", encoding="utf-8") as f:
-                self.current_content = f.read()
-        except Exception as e:
-            messagebox.showerror("Read error", f"Cannot read file:\n{self.current_file}\n{e}")
-            self.skip_file()
+            line = int(self.jump_var.get())
+        except ValueError:
             return
-        self.find_header_end()
-        self.extract_potential_footnotes()
-        self.listbox.delete(0, tk.END)
-        for token in self.tokens:
-            self.listbox.insert(tk.END, token["snippet"])
-
-    def find_header_end(self):
-        self.header_end_pos = 0
-        match = re.search(r"</head>\s*<body", self.current_content, re.IGNORECASE | re.DOTALL)
-        if match:
-            self.header_end_pos = match.end()
-        else:
-            match = re.search(r"<body", self.current_content, re.IGNORECASE)
-            if match:
-                self.header_end_pos = match.end()
-
-    def is_inside_p_tag(self, context, pos_in_context):
-        before = context[:pos_in_context]
-        after = context[pos_in_context:]
-        last_open = before.rfind('<p ')
-        last_close_before = before.rfind('>')
-        next_close = after.find('>')
-        if last_open == -1:
-            return False
-        if last_close_before > last_open:
-            return False
-        if next_close == -1:
-            return False
-        return True
+        offset = 0
+        for _ in range(line - 1):
+            offset = self.current_content.find("\n", offset) + 1
+            if offset == 0:
+                offset = len(self.current_content)
+                break
+        self.listbox.scroll_to(bisect_left(self.tokens.start, offset))
 
     def extract_potential_footnotes(self):
-        self.tokens = []
-        pattern = re.compile(r"\b\d{1,3}\b")
-        search_text = self.current_content[self.header_end_pos:]
-        offset = self.header_end_pos
-        for m in pattern.finditer(search_text):
-            num_str = m.group()
-            num_val = int(num_str)
-            if FILTER_YEARS and re.match(r"^(19\d{2}|20\d{2})$", num_str):
-                continue
-            global_start = offset + m.start()
-            global_end   = offset + m.end()
-            context_start = max(0, global_start - 50)
-            context_end = min(len(self.current_content), global_end + 50)
-            context = self.current_content[context_start:context_end]
-            if '<p style="display: inline;">' in context or '<p style="font-size: 0.8em; color: gray;">' in context:
-                pos_in_context = global_start - context_start
-                if self.is_inside_p_tag(context, pos_in_context):
-                    continue
-            snippet_start = max(0, global_start - 36)
-            snippet_end   = min(len(self.current_content), global_end + CONTEXT_LENGTH)
-            snippet = self.current_content[snippet_start:snippet_end]
-            snippet = snippet.replace("\n", " ").strip()
-            while "  " in snippet:
-                snippet = snippet.replace("  ", " ")
-            snippet = snippet.replace(num_str, to_bold(num_str), 1)
-            self.tokens.append({
-                "global_start": global_start,
-                "global_end":   global_end,
-                "number":       num_val,
-                "text":         num_str,
-                "snippet":      snippet
-            })
-
-    def on_listbox_click(self, event):
-        index = self.listbox.nearest(event.y)
-        self.listbox.activate(index)
-        for i in range(index + 1, len(self.tokens)):
-            self.listbox.selection_clear(i)
-        if index in self.listbox.curselection():
-            self.listbox.selection_clear(index)
+        self.tokens = extract_candidates(self.current_content, TokenStore(self.content_of, make_snippet))
+        self.number_index = build_number_index(self.tokens.number)
+
+    def on_listbox_click(self, index):
+        self.listbox.clear_after(index)
+        if index in self.listbox.selected:
+            self.listbox.selected.discard(index)
         else:
-            self.listbox.selection_set(index)
-            self.on_selection_change(None)
-        return "break"
+            self.listbox.selected.add(index)
+            self.listbox.selected.update(self.find_forward_consecutive(index))
+        self.listbox.refresh()
 
     def find_forward_consecutive(self, anchor_idx):
         if anchor_idx >= len(self.tokens):
             return []
-        anchor_num = self.tokens[anchor_idx]["number"]
-        result = []
-        next_expected = anchor_num + 1
-        for i in range(anchor_idx + 1, len(self.tokens)):
-            if self.tokens[i]["number"] == next_expected:
-                result.append(i)
-                next_expected += 1
-        return result
-
-    def on_selection_change(self, event):
-        self.listbox.unbind("<<ListboxSelect>>")
-        try:
-            sel = list(self.listbox.curselection())
-            if not sel:
-                return
-            anchor = self.listbox.index(tk.ACTIVE)
-            if anchor not in sel:
-                sel.append(anchor)
-            for i in range(anchor + 1, len(self.tokens)):
-                self.listbox.selection_clear(i)
-            for idx in self.find_forward_consecutive(anchor):
-                self.listbox.selection_set(idx)
-        finally:
-            self.listbox.bind("<<ListboxSelect>>", self.on_selection_change)
+        anchor_num = self.tokens.number[anchor_idx]
+        return find_forward_chain(self.number_index, anchor_idx, anchor_num)
 
     def apply_and_save(self):
-        sel = self.listbox.curselection()
+        sel = self.listbox.sorted_selection()
         if not sel:
             if messagebox.askyesno("No selection", "No numbers selected. Skip file?"):
                 self.skip_file()
             return
-        selected = [self.tokens[i] for i in sel]
-        selected.sort(key=lambda x: x["global_start"], reverse=True)
-        content = self.current_content
-        for tok in selected:
-            start = tok["global_start"]
-            end   = tok["global_end"]
-            content = content[:start] + f"<sup>{tok['text']}</sup>" + content[end:]
-        backup_path = self.current_file + ".bak"
-        try:
-            with open(self.current_file, "w", encoding="utf-8") as f:
-                f.write(content)
-            self.load_next_file()
-        except Exception as e:
-            messagebox.showerror("Write failed", str(e))
-            try:
-                os.replace(backup_path, self.current_file)
-            except:
-                pass
+        content = wrap_sup(self.current_content, [(self.tokens.start[i], self.tokens.end[i]) for i in sel])
+        self.write_queue.put((self.current_file, self.current_data, content.encode("utf-8")))
+        self.load_next_file()
 
     def skip_file(self):
+        self.write_queue.put((self.current_file, self.current_data, None))
         self.load_next_file()
 
+    def write_worker(self):
+        while True:
+            job = self.write_queue.get()
+            try:
+                if job is None:
+                    return
+                path, original, data = job
+                try:
+                    if data is not None:
+                        write_atomic(path + ".bak", original)
+                        write_atomic(path, data)
+                        self.manifest.record(os.path.basename(path), content_hash(data), "saved")
+                    else:
+                        self.manifest.record(os.path.basename(path), content_hash(original), "skipped")
+                    self.manifest.save()
+                except OSError as e:
+                    self.write_errors.put(f"{path}:\n{e}")
+            finally:
+                self.write_queue.task_done()
+
+    def poll_write_errors(self):
+        try:
+            while True:
+                messagebox.showerror("Write failed", self.write_errors.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            self.after(200, self.poll_write_errors)
+        except tk.TclError:
+            pass
+
+    def quit_session(self):
+        if not self.writer.is_alive():
+            return
+        self.write_queue.put(None)
+        self.writer.join()
+        while not self.write_errors.empty():
+            messagebox.showerror("Write failed", self.write_errors.get_nowait())
+        self.destroy()
+
     def load_next_file(self):
         self.file_index += 1
         self.load_current_file()
 
+def main():
+    parser = argparse.ArgumentParser(description="Wrap footnote reference numbers in XHTML files in <sup> tags.")
+    parser.add_argument("inputs", nargs="*", help="files, folders or .epub archives to process without the GUI")
+    parser.add_argument("--threshold", type=float, default=AUTO_CONFIDENCE, help="minimum chain confidence to apply")
+    parser.add_argument("--dry-run", action="store_true", help="report chains without writing files")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    args = parser.parse_args()
+    if not args.inputs:
+        app = FootnoteXHTMLProcessor()
+        app.mainloop()
+        return
+    files = expand_inputs(args.inputs, BATCH_SUFFIXES)
+    if not files:
+        print("No input files found")
+        sys.exit(1)
+    if run_batch(files, args.threshold, args.dry_run, args.jobs):
+        sys.exit(1)
+
 if __name__ == '__main__':
-    app = FootnoteXHTMLProcessor()
-    app.mainloop()
+    main()
@@ -1,31 +1,18 @@
-import json
 import random
 import hashlib
-from collections import defaultdict
+from itertools import chain, groupby
 from pathlib import Path
-from typing import List, Dict, Any
-
-def load_jsonl(path: Path) -> List[Dict[str, Any]]:
-    entries = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                entry = json.loads(line)
-                if "page" in entry and "text" in entry and "label" in entry:
-                    entries.append(entry)
-            except json.JSONDecodeError:
-                continue
-    return entries
-
-def build_page_groups(entries: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
-    groups = defaultdict(list)
-    for entry in entries:
-        page = entry["page"]
-        groups[page].append(entry)
-    return dict(groups)
+from typing import Iterable, Iterator, List, Dict, Any, Tuple
+from jsonl_io import iter_blocks, write_blocks, print_error
+
+def load_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    for entry in iter_blocks(path, on_error=print_error):
+        if "page" in entry and "text" in entry and "label" in entry:
+            yield entry
+
+def iter_page_runs(entries: Iterable[Dict[str, Any]]) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    for page, run in groupby(entries, key=lambda entry: entry["page"]):
+        yield page, list(run)
 
 FOOTER_INTROS = [
     "See also", "See", "See further", "Cf.", "Cf", "Compare", "See also",
@@ -151,27 +138,17 @@ def create_footer_entry(page: int, text: str) -> Dict[str, Any]:
         "text": text
     }
 
-def insert_footers_between_pages(groups: Dict[int, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
-    if not groups:
-        return []
-    sorted_pages = sorted(groups.keys())
-    result = []
-    for i, current_page in enumerate(sorted_pages):
-        current_items = groups[current_page]
-        result.extend(current_items)
-        if i < len(sorted_pages) - 1:
-            next_page = sorted_pages[i + 1]
-            if next_page == current_page + 1:
-                num_footers = decide_number_of_footers()
-                new_footers = generate_footers_for_boundary(next_page, num_footers)
-                result.extend(new_footers)
-    return result
-
-def save_jsonl(entries: List[Dict[str, Any]], path: Path) -> None:
-    with path.open("w", encoding="utf-8") as f:
-        for entry in entries:
-            json_line = json.dumps(entry, ensure_ascii=False)
-            f.write(json_line + "\n")
+def insert_footers_between_pages(page_runs: Iterable[Tuple[int, List[Dict[str, Any]]]]) -> Iterator[Dict[str, Any]]:
+    previous_page = None
+    for page, run in page_runs:
+        if previous_page is not None and page == previous_page + 1:
+            num_footers = decide_number_of_footers()
+            yield from generate_footers_for_boundary(page, num_footers)
+        yield from run
+        previous_page = page
+
+def save_jsonl(entries: Iterable[Dict[str, Any]], path: Path) -> int:
+    return write_blocks(path, entries)
 
 def decide_number_of_footers() -> int:
     r = random.random()
@@ -203,16 +180,21 @@ def main():
     if not input_path.is_file():
         print("input.json not found")
         return
-    entries = load_jsonl(input_path)
-    if not entries:
+    page_runs = iter_page_runs(load_jsonl(input_path))
+    first_run = next(page_runs, None)
+    if first_run is None:
         print("No valid entries loaded")
         return
-    page_groups = build_page_groups(entries)
-    processed = insert_footers_between_pages(page_groups)
-    save_jsonl(processed, output_path)
-    print(f"Wrote {len(processed)} lines to {output_path}")
-    print(f"Original entries: {len(entries)}")
-    print(f"Added footers:   {len(processed) - len(entries)}")
+    entry_count = 0
+    def counted_runs():
+        nonlocal entry_count
+        for page, run in chain([first_run], page_runs):
+            entry_count += len(run)
+            yield page, run
+    written = save_jsonl(insert_footers_between_pages(counted_runs()), output_path)
+    print(f"Wrote {written} lines to {output_path}")
+    print(f"Original entries: {entry_count}")
+    print(f"Added footers:   {written - entry_count}")
 
 if __name__ == "__main__":
     main()
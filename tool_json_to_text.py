@@ -1,66 +1,156 @@
 import os
 import re
 import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from html import unescape
+from jsonl_io import FAST_DECODE_ERRORS, fast_loads, iter_lines, print_error
 
-INPUT_FILE = input("Input file: ") or "input.json"
-base, ext = os.path.splitext(INPUT_FILE)
-if not ext:
-    candidate = INPUT_FILE + ".json"
-    if os.path.isfile(candidate):
-        INPUT_FILE = candidate
+CHUNK_LINES = 20000
+FLAVORS = ('plain', 'markdown', 'sentences')
+FLAVOR_SUFFIXES = {'plain': '.txt', 'markdown': '.md', 'sentences': '_sentences.txt'}
+HEADING_MARKS = {'h1': '#', 'h2': '##', 'h3': '###'}
+SUP_PATTERN = re.compile(r'<sup[^>]*>.*?</sup>', re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+SPACE_PATTERN = re.compile(r'\s+([.!?])|\s+')
+SENTENCE_BREAK = re.compile(r'([.!?…]["”’»)\]]*) (?=["“‘«(\[]?[A-ZÀ-ÖØ-Þ])')
+
+def resolve_paths(input_file):
+    base, ext = os.path.splitext(input_file)
+    if not ext:
+        candidate = input_file + ".json"
+        if os.path.isfile(candidate):
+            input_file = candidate
+        else:
+            if not os.path.isfile(input_file):
+                print(f"Error: Neither '{input_file}' nor '{candidate}' exists.")
+                exit(1)
     else:
-        if not os.path.isfile(INPUT_FILE):
-            print(f"Error: Neither '{INPUT_FILE}' nor '{candidate}' exists.")
+        if not os.path.isfile(input_file):
+            print(f"Error: File '{input_file}' does not exist.")
             exit(1)
-else:
-    if not os.path.isfile(INPUT_FILE):
-        print(f"Error: File '{INPUT_FILE}' does not exist.")
-        exit(1)
-OUTPUT_FILE = base + ".txt"
+    return input_file, base + ".txt"
+
+def collapse_space(match):
+    return match.group(1) or ' '
 
 def clean_text_block(raw_text):
     if not raw_text:
         return ""
     text = unescape(raw_text)
-    text = re.sub(r'<sup[^>]*>.*?</sup>', '', text, flags=re.IGNORECASE|re.DOTALL)
-    text = re.sub(r'<[^>]+>', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    text = re.sub(r'\s+([.!?])', r'\1', text)
-    return text
+    if '<' in text:
+        text = TAG_PATTERN.sub(' ', SUP_PATTERN.sub('', text))
+    return SPACE_PATTERN.sub(collapse_space, text).strip()
 
 def should_insert_blank_before(label):
     return label in ('h1', 'h2')
 
-def process_jsonl_to_text(input_path, output_path):
+def format_lines(flavor, label, text, first_block):
+    lines = []
+    if flavor == 'markdown':
+        if not first_block:
+            lines.append('')
+        mark = HEADING_MARKS.get(label)
+        lines.append(f"{mark} {text}" if mark else text)
+        return lines
+    if should_insert_blank_before(label) and not first_block:
+        lines.append('')
+    if flavor == 'sentences' and label not in HEADING_MARKS:
+        lines.extend(SENTENCE_BREAK.sub('\\1\n', text).split('\n'))
+    else:
+        lines.append(text)
+    return lines
+
+def iter_clean_blocks(blocks):
+    for obj in blocks:
+        text = clean_text_block(obj.get('text', ''))
+        if text:
+            yield obj.get('label', ''), text
+
+def iter_text_lines(blocks, flavor='plain'):
     first_block = True
-    with open(input_path, 'r', encoding='utf-8') as fin, \
-         open(output_path, 'w', encoding='utf-8') as fout:
-        for line in fin:
-            line = line.strip()
-            if not line:
-                continue
+    for label, text in iter_clean_blocks(blocks):
+        yield from format_lines(flavor, label, text, first_block)
+        first_block = False
+
+def write_text_lines(output_path, lines):
+    with open(output_path, 'w', encoding='utf-8') as fout:
+        fout.writelines(line + '\n' for line in lines)
+
+def clean_chunk(chunk):
+    blocks = []
+    errors = []
+    for line_num, line in chunk:
+        try:
+            blocks.append(fast_loads(line))
+        except FAST_DECODE_ERRORS:
             try:
-                obj = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-            label = obj.get('label', '')
-            raw_text = obj.get('text', '')
-            text = clean_text_block(raw_text)
-            if not text:
-                continue
-            if should_insert_blank_before(label):
-                if not first_block:
-                    fout.write('\n')
-                fout.write(text + '\n')
-            else:
-                fout.write(text + '\n')
+                blocks.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                errors.append((line_num, str(e)))
+    return list(iter_clean_blocks(blocks)), errors
+
+def iter_chunks(path, chunk_lines=CHUNK_LINES):
+    chunk = []
+    for item in iter_lines(path):
+        chunk.append(item)
+        if len(chunk) >= chunk_lines:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def report_chunk(result):
+    cleaned, errors = result
+    for line_num, error in errors:
+        print_error(line_num, error)
+    return cleaned
+
+def iter_cleaned(input_path, jobs=1, chunk_lines=CHUNK_LINES):
+    chunks = iter_chunks(input_path, chunk_lines)
+    if jobs <= 1:
+        for chunk in chunks:
+            yield from report_chunk(clean_chunk(chunk))
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(clean_chunk, chunk))
+            if len(in_flight) >= jobs * 2:
+                yield from report_chunk(in_flight.popleft().result())
+        while in_flight:
+            yield from report_chunk(in_flight.popleft().result())
+
+def export_text(input_path, outputs, jobs=1):
+    files = {flavor: open(path, 'w', encoding='utf-8') for flavor, path in outputs.items()}
+    try:
+        first_block = True
+        for label, text in iter_cleaned(input_path, jobs):
+            for flavor, fout in files.items():
+                fout.write('\n'.join(format_lines(flavor, label, text, first_block)))
+                fout.write('\n')
             first_block = False
+    finally:
+        for fout in files.values():
+            fout.close()
+
+def process_jsonl_to_text(input_path, output_path, jobs=1):
+    export_text(input_path, {'plain': output_path}, jobs)
 
 def main():
-    process_jsonl_to_text(INPUT_FILE, OUTPUT_FILE)
-    print(f"Clean text written to {OUTPUT_FILE}")
+    parser = argparse.ArgumentParser(description="Export JSONL blocks as clean text.")
+    parser.add_argument("input", nargs="?", help="JSONL file (prompted for when omitted)")
+    parser.add_argument("-f", "--flavor", action="append", choices=FLAVORS,
+                        help="output flavor, may be repeated (default: plain)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    args = parser.parse_args()
+    input_file, output_file = resolve_paths(args.input or input("Input file: ") or "input.json")
+    base = os.path.splitext(output_file)[0]
+    outputs = {flavor: base + FLAVOR_SUFFIXES[flavor] for flavor in args.flavor or ['plain']}
+    export_text(input_file, outputs, args.jobs)
+    for path in outputs.values():
+        print(f"Clean text written to {path}")
 
 if __name__ == '__main__':
     main()
-
@@ -1,13 +1,14 @@
-import json
 import re
 from pathlib import Path
+from jsonl_io import iter_blocks, write_blocks, print_error
 
 INPUT_FILE = Path("input.json")
 OUTPUT_FILE = Path("intput_merge.json")
 
-def is_likely_hyphen_break(prev_text, next_text):
-    if not prev_text or not next_text:
-        return False
+SKIP_LABELS = ("exclude", "footer", "header", "page_header")
+LOOKAHEAD = 8
+
+def ends_with_hyphen_break(prev_text):
     prev_clean = prev_text.rstrip()
     if not prev_clean:
         return False
@@ -16,55 +17,63 @@ def is_likely_hyphen_break(prev_text, next_text):
         return False
     if len(prev_clean) < 2:
         return False
-    if not prev_clean[-2].isalpha():
+    return prev_clean[-2].isalpha()
+
+def is_likely_hyphen_break(prev_text, next_text):
+    if not prev_text or not next_text:
+        return False
+    if not ends_with_hyphen_break(prev_text):
         return False
     if not next_text[0].islower():
         return False
     return True
 
-def merge_hyphen_breaks(blocks):
-    result = []
-    i = 0
+def merge_hyphen_breaks(blocks, skip_labels=SKIP_LABELS, lookahead=LOOKAHEAD):
     merge_count = 0
-    while i < len(blocks):
-        current = blocks[i].copy()
-        if i + 1 < len(blocks) and is_likely_hyphen_break(current["text"], blocks[i + 1]["text"]):
-            next_block = blocks[i + 1]
-            prev_clean = current["text"].rstrip(' -\xad\u200b\u200c\u200d')
-            merged_text = prev_clean + next_block["text"]
-            current["text"] = merged_text
-            i += 2
+    pending = None
+    held = []
+    for block in blocks:
+        if block.get("label") in skip_labels:
+            if pending is not None and len(held) < lookahead and ends_with_hyphen_break(pending["text"]):
+                held.append(block)
+                continue
+            if pending is not None:
+                yield pending
+                yield from held
+                pending = None
+                held = []
+            yield block
+            continue
+        if pending is not None and is_likely_hyphen_break(pending["text"], block["text"]):
+            prev_clean = pending["text"].rstrip(' -\xad\u200b\u200c\u200d')
+            pending = dict(pending)
+            pending["text"] = prev_clean + block["text"]
             merge_count += 1
-        else:
-            i += 1
-        result.append(current)
+            continue
+        if pending is not None:
+            yield pending
+            yield from held
+            held = []
+        pending = block
+    if pending is not None:
+        yield pending
+        yield from held
     print(f"Performed {merge_count} merges")
-    return result
+
+def only_text_blocks(blocks):
+    for block in blocks:
+        if "text" not in block or not isinstance(block["text"], str):
+            continue
+        yield block
+
+def load_text_blocks(path):
+    return only_text_blocks(iter_blocks(path, on_error=print_error))
 
 def main():
     print(f"Reading {INPUT_FILE}")
-    blocks = []
-    with INPUT_FILE.open(encoding="utf-8") as f:
-        for line_nr, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                block = json.loads(line)
-                if "text" not in block or not isinstance(block["text"], str):
-                    continue
-                blocks.append(block)
-            except json.JSONDecodeError:
-                print(f"JSON error on line {line_nr}")
-                continue
-    print(f"Loaded {len(blocks)} blocks")
-    fixed_blocks = merge_hyphen_breaks(blocks)
-    with OUTPUT_FILE.open("w", encoding="utf-8") as f:
-        for block in fixed_blocks:
-            json.dump(block, f, ensure_ascii=False, separators=(",", ":"))
-            f.write("\n")
-    print(f"Saved to {OUTPUT_FILE}")
+    fixed_blocks = merge_hyphen_breaks(load_text_blocks(INPUT_FILE))
+    written = write_blocks(OUTPUT_FILE, fixed_blocks, separators=(",", ":"))
+    print(f"Saved {written} blocks to {OUTPUT_FILE}")
 
 if __name__ == "__main__":
     main()
-
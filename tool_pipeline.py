@@ -0,0 +1,74 @@
+import os
+import argparse
+from jsonl_io import iter_blocks, write_blocks, print_error
+from tool_merge_splits import merge_hyphen_breaks, only_text_blocks
+from tool_replace_ligatures import replace_ligatures
+from tool_remove_chapter_preambles import remove_preambles
+from tool_json_to_text import clean_text_block, iter_text_lines, write_text_lines
+
+TEXT_STAGE = "text"
+
+def block_text(block):
+    text = block.get("text", "")
+    return text if isinstance(text, str) else ""
+
+def stage_merge(blocks):
+    return merge_hyphen_breaks(only_text_blocks(blocks))
+
+def stage_ligatures(blocks):
+    for block in blocks:
+        if isinstance(block.get("text"), str):
+            block["text"] = replace_ligatures(block["text"])
+        yield block
+
+def preamble_key(block):
+    return clean_text_block(block_text(block))
+
+def stage_preambles(blocks):
+    return remove_preambles(blocks, key=preamble_key)
+
+STAGES = {
+    "merge": stage_merge,
+    "ligatures": stage_ligatures,
+    "preambles": stage_preambles,
+}
+
+def build_pipeline(blocks, stage_names):
+    for name in stage_names:
+        blocks = STAGES[name](blocks)
+    return blocks
+
+def default_output_path(input_path, export_text):
+    base, ext = os.path.splitext(input_path)
+    return base + "_pipeline" + (".txt" if export_text else ext or ".json")
+
+def run_pipeline(input_path, output_path, stage_names):
+    export_text = bool(stage_names) and stage_names[-1] == TEXT_STAGE
+    block_stages = stage_names[:-1] if export_text else stage_names
+    blocks = build_pipeline(iter_blocks(input_path, on_error=print_error), block_stages)
+    if export_text:
+        write_text_lines(output_path, iter_text_lines(blocks))
+    else:
+        write_blocks(output_path, blocks)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run several cleanup stages over a JSONL file in one pass.",
+        epilog="'preambles' matches blocks by their cleaned text, the same text the 'text' export writes, "
+               "one block per line. Unlike tool_remove_chapter_preambles on an exported .txt file, it "
+               "ignores the blank lines the export inserts before h1/h2 headings.")
+    parser.add_argument("input", help="input JSONL file")
+    parser.add_argument("stages", nargs="+", choices=list(STAGES) + [TEXT_STAGE],
+                        help="stages in order; 'text' exports plain text and must come last")
+    parser.add_argument("-o", "--output", help="output file (default: <input>_pipeline.json or .txt)")
+    args = parser.parse_args()
+    if TEXT_STAGE in args.stages[:-1]:
+        parser.error("'text' can only be the last stage")
+    if not os.path.isfile(args.input):
+        parser.error(f"File '{args.input}' does not exist")
+    output_path = args.output or default_output_path(args.input, args.stages[-1] == TEXT_STAGE)
+    run_pipeline(args.input, output_path, args.stages)
+    print(f"Ran {' -> '.join(args.stages)} on {args.input}, saved to {output_path}")
+
+if __name__ == "__main__":
+    main()
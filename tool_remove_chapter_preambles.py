@@ -1,22 +1,29 @@
 input_basename = 'input'
 
-def clean_preamble(input_path, output_path):
-    with open(input_path, 'r', encoding='utf-8') as infile:
-        lines = infile.readlines()
-    cleaned_lines = []
-    i = 0
-    while i < len(lines):
-        if (i + 3 < len(lines) and
-            lines[i].startswith('||') and
-            lines[i+1].startswith('[]') and
-            lines[i+2].startswith('[]') and
-            lines[i+3].strip() == '|'):
-            i += 4
+def is_preamble(window):
+    return (window[0].startswith('||') and
+            window[1].startswith('[]') and
+            window[2].startswith('[]') and
+            window[3].strip() == '|')
+
+def remove_preambles(items, key=None):
+    buffer = []
+    for item in items:
+        buffer.append(item)
+        if len(buffer) < 4:
+            continue
+        window = buffer if key is None else [key(b) for b in buffer]
+        if is_preamble(window):
+            buffer = []
         else:
-            cleaned_lines.append(lines[i])
-            i += 1
-    with open(output_path, 'w', encoding='utf-8') as outfile:
-        outfile.writelines(cleaned_lines)
+            yield buffer.pop(0)
+    yield from buffer
+
+def clean_preamble(input_path, output_path):
+    with open(input_path, 'r', encoding='utf-8') as infile, \
+         open(output_path, 'w', encoding='utf-8') as outfile:
+        outfile.writelines(remove_preambles(infile))
 
-clean_preamble(input_basename + '.txt', input_basename + '_cleaned.txt')
-print('Done')
+if __name__ == '__main__':
+    clean_preamble(input_basename + '.txt', input_basename + '_cleaned.txt')
+    print('Done')
@@ -1,3 +1,7 @@
+import re
+import json
+from jsonl_io import JSONL_SUFFIXES, print_error
+
 LIGATURE_MAP = {
     '\ufb00': 'ff',   # ﬀ
     '\ufb01': 'fi',   # ﬁ
@@ -7,18 +11,57 @@ LIGATURE_MAP = {
     '\ufb05': 'ft',   # ﬅ 
     '\ufb06': 'st'    # ﬆ
 }
+LIGATURE_TABLE = str.maketrans(LIGATURE_MAP)
+LIGATURE_HINT = re.compile('[\ufb00-\ufb06]|\\\\u[fF][bB]0[0-6]')
+CHUNK_SIZE = 1024 * 1024
 
 def replace_ligatures(text):
-    result = text
-    for lig, plain in LIGATURE_MAP.items():
-        result = result.replace(lig, plain)
-    return result
+    return text.translate(LIGATURE_TABLE)
+
+def replace_ligatures_stream(input_path, output_path, chunk_size=CHUNK_SIZE):
+    with open(input_path, 'r', encoding='utf-8', newline='') as fin, \
+         open(output_path, 'w', encoding='utf-8', newline='') as fout:
+        while True:
+            chunk = fin.read(chunk_size)
+            if not chunk:
+                break
+            fout.write(chunk.translate(LIGATURE_TABLE))
+
+def replace_ligatures_line(line_num, line):
+    try:
+        block = json.loads(line)
+    except json.JSONDecodeError as e:
+        print_error(line_num, e)
+        return line.translate(LIGATURE_TABLE)
+    if isinstance(block, dict) and isinstance(block.get('text'), str):
+        cleaned = replace_ligatures(block['text'])
+        if cleaned != block['text']:
+            block['text'] = cleaned
+            return json.dumps(block, ensure_ascii=False)
+    return line
+
+def replace_ligatures_jsonl(input_path, output_path):
+    with open(input_path, 'r', encoding='utf-8', newline='') as fin, \
+         open(output_path, 'w', encoding='utf-8', newline='') as fout:
+        for line_num, raw in enumerate(fin, 1):
+            if LIGATURE_HINT.search(raw):
+                line = raw.rstrip('\r\n')
+                raw = replace_ligatures_line(line_num, line) + raw[len(line):]
+            fout.write(raw)
 
 if __name__ == '__main__':
     filename = input('Input file: ').strip()
+    new_filename = filename.rsplit('.', 1)
+    if len(new_filename) == 2:
+        new_filename = new_filename[0] + '_clean.' + new_filename[1]
+    else:
+        new_filename = filename + '_clean'
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            text = f.read()
+        if filename.lower().endswith(JSONL_SUFFIXES):
+            replace_ligatures_jsonl(filename, new_filename)
+        else:
+            replace_ligatures_stream(filename, new_filename)
+        print('Saved as:', new_filename)
     except FileNotFoundError:
         print('File not found')
         exit(1)
@@ -26,18 +69,5 @@ if __name__ == '__main__':
         print('File is not valid UTF-8')
         exit(1)
     except Exception as e:
-        print('Error reading file:', e)
+        print('Error processing file:', e)
         exit(1)
-    cleaned = replace_ligatures(text)
-    new_filename = filename.rsplit('.', 1)
-    if len(new_filename) == 2:
-        new_filename = new_filename[0] + '_clean.' + new_filename[1]
-    else:
-        new_filename = filename + '_clean'
-    try:
-        with open(new_filename, 'w', encoding='utf-8') as f:
-            f.write(cleaned)
-        print('Saved as:', new_filename)
-    except Exception as e:
-        print('Error writing file:', e)
-
@@ -1,18 +1,20 @@
 import os
+import re
 import sys
+import argparse
 import tkinter as tk
 from tkinter import filedialog
-import nltk
+from concurrent.futures import ProcessPoolExecutor
+from wordlist_cache import WordlistUnion, load_english, load_wordlist_file
+from decision_store import DEFAULT_STORE, DecisionStore
+from word_segmentation import CONFIDENCE, UnigramModel, segment_tokens
 
-def load_wordlist():
-    try:
-        nltk.data.find('corpora/words')
-    except LookupError:
-        nltk.download('words', quiet=True)
-    from nltk.corpus import words
-    wl = set(w.lower() for w in words.words() if w.isalpha())
-    wl.update({'i','you','he','she','it','we','they','the','a','an','and','or','but','to','of','in','on','at'})
-    return wl
+EXTRA_WORDLISTS = []
+
+def load_wordlist(extra_paths=()):
+    wordlists = [load_english()]
+    wordlists.extend(load_wordlist_file(path) for path in extra_paths)
+    return WordlistUnion(wordlists)
 
 def read_input():
     if not sys.stdin.isatty():
@@ -26,33 +28,39 @@ def read_input():
     with open(path, "r", encoding="utf-8") as f:
         return f.read(), path
 
+TOKEN_PATTERN = re.compile(r',|[^ ,]+')
+CHUNK_LINES = 20000
+MAX_EXAMPLES = 5
+
 def tokenize_line(line):
-    result = []
-    current = ""
-    for char in line:
-        if char == ',':
-            if current: result.append(current); current=""
-            result.append(',')
-        elif char == ' ':
-            if current: result.append(current); current=""
+    return TOKEN_PATTERN.findall(line)
+
+def join_tokens(tokens):
+    parts = []
+    last = len(tokens) - 1
+    for j, token in enumerate(tokens):
+        if token == ',':
+            parts.append(',' if j == last else ', ')
+        elif j > 0 and tokens[j-1] != ',':
+            parts.append(' ' + token)
         else:
-            current += char
-    if current: result.append(current)
-    return result
+            parts.append(token)
+    return ''.join(parts)
 
 def get_context(tokens, start, end, width=15):
     start_idx = max(0, start - width)
     end_idx = min(len(tokens), end + width)
     return ' '.join(tokens[start_idx:end_idx])
 
-def check_word_status(tokens, i, wordlist):
+def check_word_status(tokens, i, wordlist, verbose=False):
     w1, w2 = tokens[i], tokens[i+1]
     w1l, w2l = w1.lower(), w2.lower()
     merged = w1l + w2l
     w1_valid = w1l in wordlist
     w2_valid = w2l in wordlist
     merged_valid = merged in wordlist
-    print(f"'{w1}' + '{w2}' → {w1_valid} {w2_valid}, merged: {merged_valid}")
+    if verbose:
+        print(f"'{w1}' + '{w2}' → {w1_valid} {w2_valid}, merged: {merged_valid}")
     return {
         'w1_valid': w1_valid,
         'w2_valid': w2_valid,
@@ -62,39 +70,27 @@ def check_word_status(tokens, i, wordlist):
         'merged': merged
     }
 
-def find_all_pairs(lines, wordlist):
+def classify_pair(info):
+    if info['w1_valid'] and info['w2_valid']:
+        return None if info['merged_valid'] else 'keep'
+    if info['merged_valid']:
+        return 'merge'
+    return None #cannot decide automatically
+
+def scan_pairs(lines, wordlist, known_decisions, first_lineno=0, verbose=False):
     candidates = {}
     auto_decisions = {}
-    for lineno, line in enumerate(lines):
+    for lineno, line in enumerate(lines, first_lineno):
         tokens = tokenize_line(line)
         for i in range(len(tokens)-1):
             if tokens[i]==',' or tokens[i+1]==',':
                 continue
-            info = check_word_status(tokens, i, wordlist)
+            info = check_word_status(tokens, i, wordlist, verbose)
             key = (info['w1l'], info['w2l'])
-            if info['w1_valid'] and info['w2_valid']:
-                if info['merged_valid']:
-                    pass
-                else:
-                    auto_decisions[key] = 'keep'
-                    continue
-            elif info['w1_valid'] and not info['w2_valid']:
-                if info['merged_valid']:
-                    auto_decisions[key] = 'merge'
-                    continue
-                else: #cannot decide automatically
-                    pass
-            elif not info['w1_valid'] and info['w2_valid']:
-                if info['merged_valid']:
-                    auto_decisions[key] = 'merge'
-                    continue
-                    pass
-            elif not info['w1_valid'] and not info['w2_valid']:
-                if info['merged_valid']:
-                    auto_decisions[key] = 'merge'
-                    continue
-                else:
-                    pass
+            decision = classify_pair(info) or known_decisions.get(key)
+            if decision:
+                auto_decisions[key] = decision
+                continue
             if key not in candidates:
                 candidates[key] = {'seq_tokens':[tokens[i],tokens[i+1]],
                                    'joined':info['merged'],
@@ -102,9 +98,43 @@ def find_all_pairs(lines, wordlist):
                                    'examples':[],
                                    'positions':[]}
             candidates[key]['count'] +=1
-            ctx = get_context(tokens, i, i+2)
-            candidates[key]['examples'].append(ctx)
+            if len(candidates[key]['examples']) < MAX_EXAMPLES:
+                candidates[key]['examples'].append(get_context(tokens, i, i+2))
             candidates[key]['positions'].append((lineno,i))
+    return candidates, auto_decisions
+
+_worker_state = {}
+
+def init_pair_worker(wordlist, known_decisions, verbose):
+    _worker_state['wordlist'] = wordlist
+    _worker_state['known'] = known_decisions
+    _worker_state['verbose'] = verbose
+
+def scan_pairs_chunk(chunk):
+    lines, first_lineno = chunk
+    return scan_pairs(lines, _worker_state['wordlist'], _worker_state['known'], first_lineno, _worker_state['verbose'])
+
+def find_all_pairs(lines, wordlist, known_decisions=None, jobs=1, chunk_lines=CHUNK_LINES, verbose=False):
+    known_decisions = known_decisions or {}
+    if jobs > 1 and len(lines) > chunk_lines:
+        chunks = [(lines[i:i + chunk_lines], i) for i in range(0, len(lines), chunk_lines)]
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_pair_worker,
+                                 initargs=(wordlist, known_decisions, verbose)) as pool:
+            partials = list(pool.map(scan_pairs_chunk, chunks))
+    else:
+        partials = [scan_pairs(lines, wordlist, known_decisions, verbose=verbose)]
+    candidates = {}
+    auto_decisions = {}
+    for part_candidates, part_auto in partials:
+        auto_decisions.update(part_auto)
+        for key, info in part_candidates.items():
+            if key not in candidates:
+                candidates[key] = info
+                continue
+            merged = candidates[key]
+            merged['count'] += info['count']
+            merged['examples'].extend(info['examples'][:MAX_EXAMPLES - len(merged['examples'])])
+            merged['positions'].extend(info['positions'])
     for k in list(candidates.keys()):
         if k in auto_decisions: del candidates[k]
     return candidates, auto_decisions
@@ -128,73 +158,178 @@ def apply_decisions(lines, decisions):
                     continue
             new_tokens.append(tokens[i])
             i+=1
-        result=""
-        for j in range(len(new_tokens)):
-            if new_tokens[j]==',':
-                result+=','
-                if j<len(new_tokens)-1: result+=' '
-            else:
-                if j>0 and new_tokens[j-1]!=',':
-                    result+=' '
-                result+=new_tokens[j]
-        new_lines.append(result)
+        new_lines.append(join_tokens(new_tokens))
     return new_lines
 
-def ask_user(candidate_info, stats):
-    root=tk.Tk()
-    root.title("Space Correction")
-    decision=tk.StringVar()
-    seq_tokens=candidate_info['seq_tokens']
-    context=candidate_info['examples'][0] if candidate_info['examples'] else ""
-    tk.Label(root, text=f"Total: {stats['total']}  Confirmed: {stats['confirmed']}  Remaining: {stats['remaining']}", font=("Arial",11)).pack(pady=10)
-    tk.Label(root, text=f"Found {candidate_info['count']} occurrence(s)", font=("Arial",12,"bold")).pack(pady=5)
-    text_widget=tk.Text(root, wrap="word", font=("Arial",16), height=8, width=90, padx=15, pady=15, bg=root.cget("bg"), relief="flat", highlightthickness=0)
-    text_widget.pack(pady=20,padx=20,fill="both",expand=True)
-    text_widget.insert("1.0",context)
-    text_widget.config(state="disabled")
-    target_phrase=seq_tokens[0]+" "+seq_tokens[1]
-    start_idx=context.find(target_phrase)
-    if start_idx!=-1:
-        start=f"1.0 + {start_idx} chars"
-        end=f"1.0 + {start_idx+len(target_phrase)} chars"
-        text_widget.tag_add("highlight", start, end)
-        text_widget.tag_config("highlight", foreground="red", font=("Arial",16,"bold"))
-    def resolve(value):
-        stats['confirmed']+=1
-        stats['remaining']-=1
-        decision.set(value)
-        root.after(100, root.destroy)
-    def on_key(event):
-        if event.char=='j': resolve('merge')
-        elif event.char=='k': resolve('keep')
-    tk.Button(root, text="Join", width=30, command=lambda:resolve('merge')).pack(pady=5)
-    tk.Button(root, text="Keep separate", width=30, command=lambda:resolve('keep')).pack(pady=5)
-    tk.Button(root, text="Quit", width=30, command=lambda:sys.exit(0)).pack(pady=10)
-    root.bind("<Key>",on_key)
-    root.geometry("900x600")
-    root.mainloop()
-    return decision.get()
-
-def process_text(lines, wordlist):
-    candidates, auto_decisions = find_all_pairs(lines, wordlist)
-    if not candidates:
-        return apply_decisions(lines, auto_decisions)
-    stats={'total':len(candidates),'confirmed':0,'remaining':len(candidates)}
+class ReviewWindow:
+    def __init__(self, candidates, store=None):
+        self.store = store
+        self.pending = candidates
+        self.position = 0
+        self.decisions = {}
+        self.history = []
+        self.quit_requested = False
+        self.done = False
+        self.current = None
+        self.root = tk.Tk()
+        self.root.title("Space Correction")
+        self.root.geometry("900x600")
+        self.stats_label = tk.Label(self.root, text="", font=("Arial",11))
+        self.stats_label.pack(pady=10)
+        self.count_label = tk.Label(self.root, text="", font=("Arial",12,"bold"))
+        self.count_label.pack(pady=5)
+        self.text_widget = tk.Text(self.root, wrap="word", font=("Arial",16), height=8, width=90, padx=15, pady=15, bg=self.root.cget("bg"), relief="flat", highlightthickness=0)
+        self.text_widget.pack(pady=20,padx=20,fill="both",expand=True)
+        self.text_widget.tag_config("highlight", foreground="red", font=("Arial",16,"bold"))
+        self.text_widget.config(state="disabled")
+        tk.Button(self.root, text="Join (j)", width=30, command=lambda:self.decide('merge')).pack(pady=5)
+        tk.Button(self.root, text="Keep separate (k)", width=30, command=lambda:self.decide('keep')).pack(pady=5)
+        tk.Label(self.root, text="J / K: join / keep all remaining pairs with the same second word   u: undo   Enter: finish", font=("Arial",10)).pack(pady=5)
+        tk.Button(self.root, text="Quit", width=30, command=self.quit).pack(pady=10)
+        self.finish_button = tk.Button(self.root, text="Finish and apply (Enter)", width=30, command=self.finish)
+        self.root.bind("<Key>", self.on_key)
+        self.root.bind("<Return>", lambda e: self.finish())
+        self.show_next()
+
+    def update_stats(self):
+        total = len(self.pending)
+        confirmed = len(self.decisions)
+        self.stats_label.config(text=f"Total: {total}  Confirmed: {confirmed}  Remaining: {total - confirmed}")
+
+    def show_next(self):
+        while self.position < len(self.pending) and self.pending[self.position][0] in self.decisions:
+            self.position += 1
+        if self.position >= len(self.pending):
+            self.current = None
+            self.update_stats()
+            self.show_done()
+            return
+        if self.done:
+            self.done = False
+            self.finish_button.pack_forget()
+        self.current = self.pending[self.position]
+        key, candidate_info = self.current
+        seq_tokens = candidate_info['seq_tokens']
+        context = candidate_info['examples'][0] if candidate_info['examples'] else ""
+        self.update_stats()
+        self.count_label.config(text=f"Found {candidate_info['count']} occurrence(s)")
+        self.text_widget.config(state="normal")
+        self.text_widget.delete("1.0", "end")
+        self.text_widget.insert("1.0", context)
+        target_phrase = seq_tokens[0]+" "+seq_tokens[1]
+        start_idx = context.find(target_phrase)
+        if start_idx != -1:
+            self.text_widget.tag_add("highlight", f"1.0 + {start_idx} chars", f"1.0 + {start_idx+len(target_phrase)} chars")
+        self.text_widget.config(state="disabled")
+
+    def show_done(self):
+        if self.done:
+            return
+        self.done = True
+        self.count_label.config(text="All pairs reviewed")
+        self.text_widget.config(state="normal")
+        self.text_widget.delete("1.0", "end")
+        self.text_widget.insert("1.0", "Press Enter or Finish to apply the decisions, or u to undo the last one.")
+        self.text_widget.config(state="disabled")
+        self.finish_button.pack(pady=5)
+
+    def decide(self, value, same_second=False):
+        if self.current is None:
+            return
+        key = self.current[0]
+        keys = [key]
+        if same_second:
+            keys += [k for k, _ in self.pending[self.position+1:] if k[1] == key[1] and k not in self.decisions]
+        for k in keys:
+            self.decisions[k] = value
+        previous = None
+        if self.store:
+            previous = self.store.rows(keys)
+            self.store.record({k: value for k in keys})
+        self.history.append((self.position, keys, previous))
+        self.show_next()
+
+    def undo(self):
+        if not self.history:
+            return
+        position, keys, previous = self.history.pop()
+        for k in keys:
+            self.decisions.pop(k, None)
+        if self.store and previous is not None:
+            self.store.restore(previous)
+        self.position = position
+        self.show_next()
+
+    def finish(self):
+        if self.done:
+            self.root.quit()
+
+    def on_key(self, event):
+        actions = {'j': lambda: self.decide('merge'), 'k': lambda: self.decide('keep'),
+                   'J': lambda: self.decide('merge', True), 'K': lambda: self.decide('keep', True),
+                   'u': self.undo}
+        action = actions.get(event.char)
+        if action:
+            action()
+
+    def quit(self):
+        self.quit_requested = True
+        self.root.quit()
+
+    def run(self):
+        self.root.mainloop()
+        self.root.destroy()
+        return self.decisions
+
+def segment_lines(lines, wordlist, threshold=CONFIDENCE):
+    model=UnigramModel.from_token_lists((tokenize_line(line) for line in lines), wordlist)
+    new_lines=[]
+    fixed=0
+    for line in lines:
+        tokens, count=segment_tokens(tokenize_line(line), model, threshold)
+        new_lines.append(join_tokens(tokens) if count else line)
+        fixed+=count
+    return new_lines, fixed
+
+def process_text(lines, wordlist, store=None, jobs=1, verbose=False, segment_threshold=CONFIDENCE):
+    if segment_threshold is not None:
+        lines, fixed=segment_lines(lines, wordlist, segment_threshold)
+        print(f"Segmentation joined {fixed} split word(s) automatically")
+    known_decisions=store.load() if store else {}
+    candidates, auto_decisions=find_all_pairs(lines, wordlist, known_decisions, jobs, verbose=verbose)
     user_decisions={}
-    for seq_key, candidate_info in sorted(candidates.items(), key=lambda x:x[1]['count'], reverse=True):
-        dec=ask_user(candidate_info, stats)
-        if dec: user_decisions[seq_key]=dec
+    if candidates:
+        review=ReviewWindow(sorted(candidates.items(), key=lambda x:x[1]['count'], reverse=True), store)
+        user_decisions=review.run()
+        if review.quit_requested:
+            sys.exit(0)
+    reused={k:d for k,d in auto_decisions.items() if known_decisions.get(k)==d}
+    if store: store.record(reused)
     all_decisions={}
     all_decisions.update(auto_decisions)
     all_decisions.update(user_decisions)
     return apply_decisions(lines, all_decisions)
 
 def main():
-    wordlist=load_wordlist()
+    parser=argparse.ArgumentParser(description="Interactively join words split by stray spaces.")
+    parser.add_argument("--wordlist", action="append", default=[], help="extra wordlist file, one word per line (repeatable)")
+    parser.add_argument("--decisions", default=DEFAULT_STORE, help="decision store reused across runs")
+    parser.add_argument("--no-decisions", action="store_true", help="do not read or record past decisions")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes for candidate discovery")
+    parser.add_argument("--segment-confidence", type=float, default=CONFIDENCE, help="minimum confidence for automatic multi-fragment joins")
+    parser.add_argument("--no-segment", action="store_true", help="only review adjacent pairs")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print the wordlist check for every token pair")
+    args=parser.parse_args()
+    wordlist=load_wordlist(EXTRA_WORDLISTS + args.wordlist)
     text, filepath=read_input()
     if text is None: sys.exit(0)
     lines=text.splitlines()
-    lines=process_text(lines, wordlist)
+    store=None if args.no_decisions else DecisionStore(args.decisions)
+    try:
+        segment_threshold=None if args.no_segment else args.segment_confidence
+        lines=process_text(lines, wordlist, store, args.jobs, args.verbose, segment_threshold)
+    finally:
+        if store: store.close()
     if filepath:
         base, ext=os.path.splitext(filepath)
         outpath=f"output{ext}"
@@ -0,0 +1,90 @@
+import tkinter as tk
+from tkinter import font as tkfont
+
+class VirtualList(tk.Frame):
+    def __init__(self, master, get_text, get_color=None, on_click=None, font=("Consolas", 10)):
+        super().__init__(master)
+        self.get_text = get_text
+        self.get_color = get_color
+        self.on_click = on_click
+        self.row_count = 0
+        self.top = 0
+        self.visible = 1
+        self.selected = set()
+        self.row_height = tkfont.Font(font=font).metrics("linespace") + 1
+        self.listbox = tk.Listbox(self, font=font, selectmode=tk.BROWSE, exportselection=False, activestyle="none")
+        # Drop the Listbox class bindings (space, Select, Control-slash, arrows, drag) so that
+        # self.selected stays the only source of the highlighted rows.
+        self.listbox.bindtags((str(self.listbox), str(self.listbox.winfo_toplevel()), "all"))
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.bind("<Button-1>", self.on_button)
+        self.listbox.bind("<Configure>", self.on_configure)
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll_by(-1 if e.delta > 0 else 1, "units"))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll_by(-1, "units"))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll_by(1, "units"))
+        self.listbox.bind("<Prior>", lambda e: self.scroll_by(-1, "pages"))
+        self.listbox.bind("<Next>", lambda e: self.scroll_by(1, "pages"))
+
+    def set_row_count(self, row_count):
+        self.row_count = row_count
+        self.top = 0
+        self.selected = set()
+        self.refresh()
+
+    def on_configure(self, event):
+        visible = max(1, event.height // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.row_count))
+        else:
+            self.scroll_by(int(amount), unit)
+
+    def scroll_by(self, amount, unit):
+        step = self.visible if unit == "pages" else 3
+        self.scroll_to(self.top + amount * step)
+        return "break"
+
+    def scroll_to(self, row):
+        self.top = max(0, min(row, self.row_count - self.visible))
+        self.refresh()
+
+    def show(self, row):
+        if row < self.top or row >= self.top + self.visible:
+            self.scroll_to(row - self.visible // 3)
+
+    def refresh(self):
+        self.listbox.delete(0, tk.END)
+        end = min(self.row_count, self.top + self.visible)
+        for local, row in enumerate(range(self.top, end)):
+            self.listbox.insert(tk.END, self.get_text(row))
+            if self.get_color:
+                color = self.get_color(row)
+                if color:
+                    self.listbox.itemconfig(local, {'fg': color})
+            if row in self.selected:
+                self.listbox.selection_set(local)
+        if self.row_count:
+            self.scrollbar.set(self.top / self.row_count, end / self.row_count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def on_button(self, event):
+        self.listbox.focus_set()
+        if not self.row_count:
+            return "break"
+        row = self.top + self.listbox.nearest(event.y)
+        if row < self.row_count and self.on_click:
+            self.on_click(row)
+        return "break"
+
+    def clear_after(self, row):
+        self.selected = {i for i in self.selected if i <= row}
+
+    def sorted_selection(self):
+        return sorted(self.selected)
@@ -0,0 +1,127 @@
+import re
+import math
+from collections import Counter
+
+MAX_FRAGMENT_LEN = 6
+MAX_WINDOW = 8
+MAX_JOIN = 5
+CONFIDENCE = 0.9
+PRIOR = 1.0
+PRIOR_MASS = 100000
+UNKNOWN_DISCOUNT = 0.1
+MIN_CORPUS_COUNT = 2
+FRAGMENT_PATTERN = re.compile(r"^(\W*)([^\W\d_]+)(\W*)$")
+
+class UnigramModel:
+    def __init__(self, wordlist, counts):
+        self.wordlist = wordlist
+        self.counts = counts
+        self.total = sum(counts.values()) + PRIOR_MASS
+        self._scores = {}
+
+    @classmethod
+    def from_token_lists(cls, token_lists, wordlist):
+        counts = Counter()
+        for tokens in token_lists:
+            for token in tokens:
+                m = FRAGMENT_PATTERN.match(token)
+                if m:
+                    counts[m.group(2).lower()] += 1
+        return cls(wordlist, counts)
+
+    def is_known(self, word):
+        return word in self.wordlist or self.counts.get(word, 0) >= MIN_CORPUS_COUNT
+
+    def score(self, word):
+        cached = self._scores.get(word)
+        if cached is not None:
+            return cached
+        count = self.counts.get(word, 0)
+        unknown = math.log(10.0 / self.total) - len(word) * math.log(10.0)
+        if word in self.wordlist:
+            value = math.log((count + PRIOR) / self.total)
+        elif count:
+            value = max(unknown, math.log(count * UNKNOWN_DISCOUNT / self.total))
+        else:
+            value = unknown
+        self._scores[word] = value
+        return value
+
+def log_add(a, b):
+    if a == -math.inf:
+        return b
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+def segment_window(cores, model):
+    n = len(cores)
+    span_scores = {}
+    for j in range(1, n + 1):
+        for i in range(max(0, j - MAX_JOIN), j):
+            span_scores[i, j] = model.score(''.join(cores[i:j]))
+    best = [0.0] + [-math.inf] * n
+    forward = [0.0] + [-math.inf] * n
+    back = [0] * (n + 1)
+    for (i, j), s in span_scores.items():
+        if best[i] + s > best[j]:
+            best[j] = best[i] + s
+            back[j] = i
+        forward[j] = log_add(forward[j], forward[i] + s)
+    backward = [-math.inf] * n + [0.0]
+    for (i, j), s in sorted(span_scores.items(), reverse=True):
+        backward[i] = log_add(backward[i], s + backward[j])
+    groups = []
+    j = n
+    while j > 0:
+        i = back[j]
+        confidence = math.exp(forward[i] + span_scores[i, j] + backward[j] - forward[n])
+        groups.append((i, j, confidence))
+        j = i
+    groups.reverse()
+    return groups
+
+def find_windows(tokens, wordlist):
+    run = []
+    for idx, token in enumerate(tokens):
+        m = FRAGMENT_PATTERN.match(token)
+        if not m or len(m.group(2)) > MAX_FRAGMENT_LEN:
+            yield from split_run(run, wordlist)
+            run = []
+            continue
+        lead, core, trail = m.groups()
+        if lead:
+            yield from split_run(run, wordlist)
+            run = []
+        run.append((idx, core.lower()))
+        if trail:
+            yield from split_run(run, wordlist)
+            run = []
+    yield from split_run(run, wordlist)
+
+def split_run(run, wordlist):
+    for start in range(0, len(run), MAX_WINDOW):
+        window = run[start:start + MAX_WINDOW]
+        if len(window) > 1 and any(core not in wordlist for _, core in window):
+            yield window[0][0], [core for _, core in window]
+
+def segment_tokens(tokens, model, threshold=CONFIDENCE):
+    joins = []
+    for first, cores in find_windows(tokens, model.wordlist):
+        for i, j, confidence in segment_window(cores, model):
+            if j - i < 2 or confidence < threshold:
+                continue
+            if all(core in model.wordlist for core in cores[i:j]):
+                continue
+            if model.is_known(''.join(cores[i:j])):
+                joins.append((first + i, first + j))
+    if not joins:
+        return tokens, 0
+    result = []
+    pos = 0
+    for i, j in joins:
+        result.extend(tokens[pos:i])
+        result.append(''.join(tokens[i:j]))
+        pos = j
+    result.extend(tokens[pos:])
+    return result, len(joins)
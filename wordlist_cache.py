@@ -0,0 +1,112 @@
+import os
+import mmap
+import array
+import bisect
+import struct
+import hashlib
+
+CACHE_DIR = os.environ.get('JSONL_TOOLS_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'json-lines-tools'))
+ENGLISH_VERSION = 'nltk-words-1'
+BASE_WORDS = {'i','you','he','she','it','we','they','the','a','an','and','or','but','to','of','in','on','at'}
+MAGIC = b'WLC1'
+HEADER = struct.Struct('=4sI')
+
+class CompiledWordlist:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a compiled wordlist: {path}")
+        index_end = HEADER.size + 4 * (count + 1)
+        self._offsets = memoryview(self._mm)[HEADER.size:index_end].cast('I')
+        self._data_start = index_end
+        self._count = count
+        self._seen = {}
+
+    def __reduce__(self):
+        return (CompiledWordlist, (self.path,))
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return self._mm[self._data_start + self._offsets[i]:self._data_start + self._offsets[i + 1]]
+
+    def __contains__(self, word):
+        found = self._seen.get(word)
+        if found is None:
+            key = word.encode('utf-8')
+            i = bisect.bisect_left(self, key)
+            found = i < self._count and self[i] == key
+            self._seen[word] = found
+        return found
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i].decode('utf-8')
+
+class WordlistUnion:
+    def __init__(self, wordlists):
+        self.wordlists = list(wordlists)
+
+    def __contains__(self, word):
+        return any(word in wl for wl in self.wordlists)
+
+    def __iter__(self):
+        seen = set()
+        for wl in self.wordlists:
+            for word in wl:
+                if word not in seen:
+                    seen.add(word)
+                    yield word
+
+def compile_wordlist(words, path):
+    encoded = sorted({w.encode('utf-8') for w in words})
+    offsets = array.array('I', [0])
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(encoded)))
+        f.write(offsets.tobytes())
+        for word in encoded:
+            f.write(word)
+    os.replace(tmp_path, path)
+
+def load_compiled(name, version_key, build_words):
+    digest = hashlib.sha1(version_key.encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f"{name}-{digest}.wlc")
+    try:
+        if not os.path.isfile(path):
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            compile_wordlist(build_words(), path)
+        return CompiledWordlist(path)
+    except (OSError, ValueError) as e:
+        print(f"Wordlist cache unavailable ({e}), building {name} in memory")
+        return set(build_words())
+
+def english_words():
+    import nltk
+    try:
+        nltk.data.find('corpora/words')
+    except LookupError:
+        nltk.download('words', quiet=True)
+    from nltk.corpus import words
+    wl = set(w.lower() for w in words.words() if w.isalpha())
+    wl.update(BASE_WORDS)
+    return wl
+
+def file_words(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return set(w.strip().lower() for w in f if w.strip().isalpha())
+
+def load_english():
+    return load_compiled('english', ENGLISH_VERSION + ':' + ','.join(sorted(BASE_WORDS)), english_words)
+
+def load_wordlist_file(path):
+    stat = os.stat(path)
+    version_key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    name = os.path.splitext(os.path.basename(path))[0]
+    return load_compiled(name, version_key, lambda: file_words(path))
@@ -0,0 +1,44 @@
+import re
+
+MARKUP_PATTERN = re.compile(r"""
+    <!--.*?-->
+  | <!\[CDATA\[.*?\]\]>
+  | <[!?][^>]*>
+  | <(?P<close>/?)(?P<tag>[A-Za-z][\w:.-]*)(?:[^>"']|"[^"]*"|'[^']*')*?(?P<empty>/?)>
+  | &(?:\#\d+|\#[xX][0-9a-fA-F]+|\w+);
+""", re.S | re.X)
+DIGIT_PATTERN = re.compile(r"\b\d+\b")
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input",
+                 "link", "meta", "param", "source", "track", "wbr"}
+RAW_TEXT_END = {name: re.compile(r"</%s\s*>" % name, re.I) for name in ("script", "style")}
+
+def iter_text_nodes(content):
+    stack = ()
+    pos = 0
+    length = len(content)
+    while pos < length:
+        m = MARKUP_PATTERN.search(content, pos)
+        if not m:
+            yield pos, length, stack
+            return
+        if m.start() > pos:
+            yield pos, m.start(), stack
+        pos = m.end()
+        tag = m.group("tag")
+        if not tag:
+            continue
+        tag = tag.lower()
+        if m.group("close"):
+            if tag in stack:
+                stack = stack[:len(stack) - 1 - stack[::-1].index(tag)]
+        elif not m.group("empty") and tag not in VOID_ELEMENTS:
+            if tag in RAW_TEXT_END:
+                end = RAW_TEXT_END[tag].search(content, pos)
+                pos = end.end() if end else length
+                continue
+            stack = stack + (tag,)
+
+def iter_digit_runs(content):
+    for start, end, stack in iter_text_nodes(content):
+        for m in DIGIT_PATTERN.finditer(content, start, end):
+            yield m.start(), m.end(), stack